@@ -0,0 +1,63 @@
+"""
+Benchmark the CASE statement extraction against the former comma splitting
+
+The embedded `sqlquery`, `sqlquery2` and `sqlquery3` samples of lineage.py are
+repeated to build larger scripts.
+
+Usage
+------
+    python benchmarks/bench_case.py [--scales 1 10 100 1000]
+"""
+
+# imports
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jaal.lineage import parseCase, sqlquery, sqlquery2, sqlquery3
+
+def legacy_parse_case(query):
+    """The comma splitting parseCase used before the keyword scan (without the xls export)"""
+    split_list = query.split(",")
+    need_join = False
+    join_list = []
+    for sentence in split_list:
+        if need_join:
+            join_list[-1] = join_list[-1] + "," + sentence
+        else:
+            join_list.append(sentence)
+        if "case" in sentence.lower():
+            need_join = True
+        if "end" in sentence.lower():
+            need_join = False
+    caselist2 = []
+    for i in join_list:
+        if (("CASE" in i) | ("case" in i)):
+            casename = i.split(" ")[len(i.split(" ")) - 1]
+            caselist2.append({casename: ' '.join(i.split())})
+    return caselist2
+
+def time_it(func, *args, repeat=3):
+    """Best wall time of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    sample = ";\n".join([sqlquery, sqlquery2, sqlquery3])
+    print(f"{'copies':>8} {'chars':>10} {'legacy s':>10} {'scan s':>10} {'legacy n':>9} {'scan n':>9}")
+    for scale in args.scales:
+        script = ";\n".join([sample]*scale)
+        legacy_seconds = time_it(legacy_parse_case, script)
+        seconds = time_it(parseCase, script)
+        print(f"{scale:>8} {len(script):>10} {legacy_seconds:>10.4f} {seconds:>10.4f} "
+              f"{len(legacy_parse_case(script)):>9} {len(parseCase(script)):>9}")
@@ -0,0 +1,71 @@
+"""
+Benchmark the node degree computation on synthetic graphs
+
+Usage
+------
+    python benchmarks/bench_degree.py [--sizes 10000 100000 1000000] [--legacy]
+
+`--legacy` also times the old nested loop (node x edge) on a small graph and
+checks that both give the same weights.
+"""
+
+# imports
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jaal.datasets.degree import compute_node_degrees, add_node_weight
+
+def make_graph(n_edges, seed=0):
+    """Create a random graph with `n_edges` edges over n_edges/2 nodes"""
+    rng = np.random.default_rng(seed)
+    n_nodes = max(n_edges // 2, 1)
+    ids = np.array(['Objd' + str(i) for i in range(n_nodes)], dtype=object)
+    edge_df = pd.DataFrame({
+        'from': ids[rng.integers(0, n_nodes, n_edges)],
+        'to': ids[rng.integers(0, n_nodes, n_edges)],
+    })
+    node_df = pd.DataFrame({'id': ids})
+    return edge_df, node_df
+
+def legacy_weight(node_df, edge_df):
+    """The nested loop used before the degree engine"""
+    weight = [0]*node_df.shape[0]
+    for index in range(node_df.shape[0]):
+        for j in edge_df.itertuples():
+            if (node_df['id'][index] == j.from_) | (node_df['id'][index] == j.to):
+                weight[index] += 1
+    return weight
+
+def time_it(func, *args, repeat=3):
+    """Best wall time of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'edges':>10} {'nodes':>10} {'seconds':>10} {'edges/s':>14}")
+    for n_edges in args.sizes:
+        edge_df, node_df = make_graph(n_edges)
+        seconds = time_it(compute_node_degrees, edge_df, node_df['id'])
+        print(f"{n_edges:>10} {node_df.shape[0]:>10} {seconds:>10.4f} {n_edges / seconds:>14,.0f}")
+
+    if args.legacy:
+        edge_df, node_df = make_graph(500)
+        legacy_edge_df = edge_df.rename(columns={'from': 'from_'})
+        seconds = time_it(legacy_weight, node_df, legacy_edge_df, repeat=1)
+        print(f"legacy nested loop on 500 edges: {seconds:.4f}s")
+        assert add_node_weight(node_df.copy(), edge_df)['weight'].tolist() == legacy_weight(node_df, legacy_edge_df)
+        print("legacy and vectorized weights match")
@@ -0,0 +1,82 @@
+"""
+Benchmark the table level lineage of sql scripts
+
+The embedded `sqlquery`, `sqlquery2` and `sqlquery3` samples of lineage.py and
+a MERGE script are repeated as many scripts, parsed in process or over a pool.
+Three scripts are checked first: the WHEN ... THEN UPDATE / INSERT clauses of
+the MERGE script write its target only, every statement of a multi statement
+script feeds only the table it writes, and a temporary table gives two hops.
+
+Usage
+------
+    python benchmarks/bench_lineage.py [--scales 1 10 100] [--workers 1 4]
+"""
+
+# imports
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from jaal.lineage import build_table_lineage, sqlquery, sqlquery2, sqlquery3
+
+MERGE_SCRIPT = """
+MERGE INTO dw.customer AS t
+USING (SELECT id, name FROM staging.customer) AS s
+ON t.id = s.id
+WHEN MATCHED THEN UPDATE SET t.name = s.name
+WHEN NOT MATCHED THEN INSERT (id, name) VALUES (s.id, s.name);
+"""
+
+MULTI_SCRIPT = """
+INSERT INTO t1 SELECT id FROM src.a;
+INSERT INTO t2 SELECT id FROM src.b;
+UPDATE t3 SET x = c.x FROM src.c AS c WHERE t3.id = c.id;
+"""
+
+TEMP_SCRIPT = """
+SELECT id, name INTO #tmp FROM src.a;
+INSERT INTO dw.final SELECT id, name FROM #tmp;
+"""
+
+def check_edges(script, expected):
+    """Check the edges of the lineage of one script"""
+    edge_df, _ = build_table_lineage([script])
+    edges = sorted(zip(edge_df['from'], edge_df['to']))
+    assert edges == sorted(expected), edges
+
+def check_merge():
+    """Check the edges of the MERGE script: staging.customer -> dw.customer only"""
+    edge_df, node_df = build_table_lineage([MERGE_SCRIPT])
+    edges = sorted(zip(edge_df['from'], edge_df['to']))
+    assert edges == [('staging.customer', 'dw.customer')], edges
+    assert sorted(node_df['id']) == ['dw.customer', 'staging.customer'], sorted(node_df['id'])
+
+def time_it(func, *args, repeat=3, **kwargs):
+    """Best wall time of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    args = parser.parse_args()
+
+    check_merge()
+    check_edges(MULTI_SCRIPT, [('src.a', 't1'), ('src.b', 't2'), ('src.c', 't3')])
+    check_edges(TEMP_SCRIPT, [('src.a', '#tmp'), ('#tmp', 'dw.final')])
+    print("merge, multi statement and temporary table checks ok")
+    sample = [sqlquery, sqlquery2, sqlquery3, MERGE_SCRIPT, MULTI_SCRIPT, TEMP_SCRIPT]
+    print(f"{'scripts':>8} {'workers':>8} {'seconds':>10} {'edges':>7}")
+    for scale in args.scales:
+        scripts = sample * scale
+        for workers in args.workers:
+            seconds = time_it(build_table_lineage, scripts, workers=workers)
+            edge_df, _ = build_table_lineage(scripts, workers=workers)
+            print(f"{len(scripts):>8} {workers:>8} {seconds:>10.4f} {len(edge_df):>7}")
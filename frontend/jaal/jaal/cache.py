@@ -0,0 +1,119 @@
+"""
+Small in-process caches shared by the callbacks
+
+The callbacks of the app can run concurrently (one upload triggers several
+of them), so the cache is thread safe and computes a missing key only once:
+concurrent callers of `get_or_compute` with the same key wait for the first one.
+"""
+
+# imports
+import hashlib
+import threading
+from collections import OrderedDict
+
+# number of characters of a string encoded and hashed at a time, so that a
+# large upload (a base64 data url) is never encoded as a whole
+HASH_BLOCK = 1 << 20
+
+def content_hash(*parts):
+    """Return a hex digest identifying the given strings (or bytes)
+
+    Parameters
+    -----------
+    parts: str or bytes
+        the contents to hash, None is hashed as empty and other values by str()
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if part is None:
+            part = b''
+        if isinstance(part, bytes):
+            # length prefix so that ('ab', 'c') and ('a', 'bc') differ
+            digest.update(str(len(part)).encode('ascii') + b':')
+            digest.update(part)
+            continue
+        part = str(part)
+        digest.update(str(len(part)).encode('ascii') + b':')
+        for start in range(0, len(part), HASH_BLOCK):
+            digest.update(part[start:start + HASH_BLOCK].encode('utf-8'))
+    return digest.hexdigest()
+
+class LRUCache:
+    """Thread safe mapping keeping at most `maxsize` entries, the least recently
+    used entry is evicted first
+    """
+    def __init__(self, maxsize=128):
+        """
+        Parameters
+        -------------
+        maxsize: int
+            maximum number of entries kept in the cache
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value of key (marking it as recently used) or default"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove key from the cache and return its value"""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def get_or_compute(self, key, func):
+        """Return the value of key, calling `func()` to compute it if missing
+
+        If another thread is already computing the same key, wait for it and
+        reuse its result instead of computing it twice.
+        """
+        while True:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return self._data[key]
+                event = self._pending.get(key)
+                if event is None:
+                    # this thread computes the value
+                    self.misses += 1
+                    event = self._pending[key] = threading.Event()
+                    break
+            # wait for the other thread, then look again (it may have failed)
+            event.wait()
+        try:
+            value = func()
+            self.put(key, value)
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+        return value
@@ -0,0 +1,157 @@
+"""
+Level of detail rendering of large graphs
+
+The nodes are grouped by the value of a node column (e.g. `schema_name` or
+`type_desc`) and every group is drawn as one cluster node, the edges between
+the groups being drawn once with the number of edges they stand for. Clicking
+a cluster expands it into its nodes. The number of nodes and edges sent to the
+browser stays bounded: the nodes of the expanded clusters over the limit stay
+in a cluster of the remaining ones, the smallest clusters over the limit are
+merged into one and only the heaviest edges are kept.
+"""
+
+# imports
+import math
+import numpy as np
+from .layout import DEFAULT_COLOR, DEFAULT_NODE_SIZE, DEFAULT_EDGE_SIZE
+from .graph_model import take, to_dicts
+
+# prefix of the ids of the cluster nodes
+CLUSTER_PREFIX = 'cluster:'
+
+def cluster_id(column, value):
+    """Return the id of the cluster node of the nodes whose column is value"""
+    return f"{CLUSTER_PREFIX}{column}:{value}"
+
+def _cluster_size(count):
+    """Size of a cluster node of count nodes, growing with the log of count"""
+    return DEFAULT_NODE_SIZE + 5 * math.log10(count + 1)
+
+def cluster_graph(data, tables, graph_index, node_mask, edge_mask, column, expanded=(), max_nodes=1000,
+                  max_edges=5000, max_clusters=200):
+    """Return the graph with its nodes grouped by column, as (graph, cluster ids)
+
+    Parameters
+    -----------
+    data: GraphModel
+        the graph
+
+    tables: GraphTables
+        the tables of data
+
+    graph_index: GraphIndex
+        the index of data
+
+    node_mask, edge_mask: numpy array
+        the nodes and edges of data to show (e.g. kept by the filters)
+
+    column: str
+        the node column to group the nodes by
+
+    expanded: set
+        the values of column whose nodes are shown one by one
+
+    max_nodes, max_edges: int
+        maximum number of nodes and edges of the graph (default: 1000 and 5000)
+
+    max_clusters: int
+        maximum number of cluster nodes, the smallest clusters over it are
+        merged into one (default: 200)
+
+    Returns
+    --------
+    (graph, cluster ids) where cluster ids maps the id of every cluster node
+    to the value of column it groups (None for the merged clusters)
+    """
+    nodes, edges = data['nodes'], data['edges']
+    codes, values = tables.groups(column)
+    n_groups = len(values)
+    shown = np.asarray(node_mask, dtype=bool)
+    is_expanded = np.zeros(n_groups, dtype=bool)
+    expanded_codes = [code for code, value in enumerate(values) if value in expanded]
+    is_expanded[expanded_codes] = True
+    # the groups drawn as a cluster, bounding the nodes shown one by one
+    collapsed_groups = np.bincount(codes[shown & ~is_expanded[codes]], minlength=n_groups) > 0
+    budget = max(max_nodes - min(int(collapsed_groups.sum()), max_clusters) - len(expanded_codes), 0)
+    # nodes shown one by one: the members of the expanded groups, most connected first
+    members = np.flatnonzero(shown & is_expanded[codes])
+    if len(members) > budget:
+        degree = (np.diff(graph_index.out_indptr) + np.diff(graph_index.in_indptr))[graph_index.node_codes]
+        members = np.sort(members[np.argsort(-degree[members], kind='stable')[:budget]])
+    single = np.zeros(len(nodes), dtype=bool)
+    single[members] = True
+    # nodes left in a cluster, counted by group
+    clustered = shown & ~single
+    counts = np.bincount(codes[clustered], minlength=n_groups)
+    groups = np.flatnonzero(counts)
+    # merge the smallest groups over max_clusters into the group n_groups
+    group_rep = np.arange(n_groups + 1)
+    if len(groups) > max_clusters:
+        smallest = groups[np.argsort(-counts[groups], kind='stable')[max(max_clusters - 1, 0):]]
+        group_rep[smallest] = n_groups
+    # representative of every node: its group (or the merged one), or itself (n_groups + 1 + position)
+    rep = np.where(single, n_groups + 1 + np.arange(len(nodes)), group_rep[codes])
+
+    # the cluster nodes, colored like their first node
+    graph_nodes = []
+    cluster_ids = {}
+    rep_ids = {}
+    clustered_positions = np.flatnonzero(clustered)
+    cluster_reps, first, rep_counts = np.unique(rep[clustered_positions], return_index=True, return_counts=True)
+    # nodes placed on the server: a cluster sits at the center of its nodes
+    centers = {}
+    if 'x' in tables.node_df.columns and 'y' in tables.node_df.columns:
+        for axis in ('x', 'y'):
+            totals = np.bincount(rep[clustered_positions], weights=tables.node_df[axis].to_numpy(dtype=float)[clustered_positions])
+            centers[axis] = totals[cluster_reps] / rep_counts
+    colors = tables.node_df['color'].to_numpy(dtype=object) if 'color' in tables.node_df.columns else None
+    for i, (group, position, count) in enumerate(zip(cluster_reps, clustered_positions[first], rep_counts)):
+        group, count = int(group), int(count)
+        color = colors[position] if colors is not None else DEFAULT_COLOR
+        if group == n_groups:
+            node_id = cluster_id(column, '(other)')
+            label = f"other ({count})"
+            title = f"{count} nodes of the smallest groups of {column}"
+            value = None
+        else:
+            value = values[group]
+            node_id = cluster_id(column, value)
+            if is_expanded[group]:
+                node_id += ':more'
+                label = f"{value}: {count} more"
+                title = f"{count} nodes of {column} {value} over the limit of {max_nodes} nodes"
+            else:
+                label = f"{value} ({count})"
+                title = f"{column}: {value}<br>{count} nodes<br>click to expand"
+        cluster_ids[node_id] = value
+        rep_ids[group] = node_id
+        graph_nodes.append({'id': node_id, 'label': label, 'title': title, 'color': color,
+                            'shape': 'dot', 'size': _cluster_size(count),
+                            **{axis: float(center[i]) for axis, center in centers.items()}})
+    graph_nodes.extend(to_dicts(take(nodes, members)))
+
+    # the edges between shown nodes, aggregated between their representatives
+    source = graph_index.code_position[graph_index.source]
+    target = graph_index.code_position[graph_index.target]
+    valid = np.asarray(edge_mask, dtype=bool) & (source >= 0) & (target >= 0)
+    valid[valid] = shown[source[valid]] & shown[target[valid]]
+    positions = np.flatnonzero(valid)
+    rep_source, rep_target = rep[source[positions]], rep[target[positions]]
+    between = rep_source != rep_target
+    positions, rep_source, rep_target = positions[between], rep_source[between], rep_target[between]
+    # the edges between two single nodes are kept as they are
+    original = (rep_source > n_groups) & (rep_target > n_groups)
+    n_reps = n_groups + 1 + len(nodes)
+    pairs, pair_counts = np.unique(rep_source[~original] * n_reps + rep_target[~original], return_counts=True)
+    order = np.argsort(-pair_counts, kind='stable')[:max_edges]
+    graph_edges = []
+    node_ids = tables.node_df['id']
+    for pair, count in zip(pairs[order], pair_counts[order]):
+        ends = []
+        for end in divmod(int(pair), n_reps):
+            ends.append(rep_ids[end] if end <= n_groups else node_ids.iloc[end - n_groups - 1])
+        graph_edges.append({'id': f"{ends[0]}__{ends[1]}", 'from': ends[0], 'to': ends[1],
+                            'title': f"{count} edges", 'color': {'color': DEFAULT_COLOR},
+                            'width': DEFAULT_EDGE_SIZE + math.log2(count)})
+    graph_edges.extend(to_dicts(take(edges, positions[original][:max_edges - len(graph_edges)])))
+    return {'nodes': graph_nodes, 'edges': graph_edges}, cluster_ids
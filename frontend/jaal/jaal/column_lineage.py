@@ -0,0 +1,588 @@
+"""
+Column level lineage of sql scripts
+
+Every output column of a query is linked to the columns it is computed from,
+through table aliases, subqueries, common table expressions, scalar subqueries
+and CASE expressions. The edges of many scripts are stored in
+ColumnLineageIndex, which answers "where does this column come from" and
+"what depends on this column" with dictionary lookups.
+"""
+
+# imports
+from .sql_tokenizer import tokenize_sql, unquote
+
+# words which are never column names
+KEYWORDS = {'case', 'when', 'then', 'else', 'end', 'and', 'or', 'not', 'null', 'is', 'in', 'as', 'distinct', 'all',
+            'like', 'ilike', 'between', 'true', 'false', 'interval', 'div', 'mod', 'exists', 'any', 'some', 'over',
+            'partition', 'by', 'order', 'asc', 'desc', 'rows', 'range', 'unbounded', 'preceding', 'following',
+            'current', 'row', 'current_date', 'current_time', 'current_timestamp', 'sysdate', 'escape',
+            'year', 'quarter', 'month', 'week', 'day', 'hour', 'minute', 'second', 'millisecond', 'dd', 'mm', 'yy',
+            'from', 'for', 'leading', 'trailing', 'both', 'nulls', 'first', 'last', 'separator', 'using', 'top'}
+# words of the FROM clause which are not table names or aliases
+JOIN_WORDS = {'join', 'left', 'right', 'full', 'inner', 'outer', 'cross', 'natural', 'lateral', 'straight_join', 'apply'}
+# words ending the select list
+SELECT_END_WORDS = {'from', 'into', 'where', 'group', 'having', 'order', 'limit', 'union', 'intersect', 'except',
+                    'window', 'qualify', 'offset', 'fetch'}
+# words ending the FROM clause
+FROM_END_WORDS = SELECT_END_WORDS - {'from'} | {'for'}
+# words which can not be an alias
+NOT_ALIAS_WORDS = KEYWORDS | JOIN_WORDS | SELECT_END_WORDS | FROM_END_WORDS | {'on', 'with', 'select', 'set', 'values'}
+# words between CREATE and TABLE/VIEW
+CREATE_MODIFIERS = {'or', 'replace', 'alter', 'temporary', 'temp', 'global', 'local', 'unlogged', 'materialized',
+                    'external', 'transient', 'volatile', 'multiset', 'recursive', 'secure'}
+
+class _Scope:
+    """Sources and output columns of one (sub)query"""
+    def __init__(self, name, parent=None, ctes=None):
+        self.name = name
+        self.parent = parent
+        self.ctes = ctes if ctes is not None else {}
+        # alias (lower) -> ('table', name) or ('scope', _Scope)
+        self.sources = {}
+        # column (lower) -> node, in select order
+        self.outputs = {}
+
+class _ColumnLineageParser:
+    """Walk the tokens of a script and collect (output node, source node, kind) edges
+
+    A node is a (scope, column) pair, where scope is a table name, the target
+    of the script, or '<script>:<alias>' for subqueries and common table expressions.
+    """
+    def __init__(self, tokens, script_name):
+        self.tokens = [token for token in tokens if token.kind != 'comment']
+        self.script_name = script_name
+        self.edges = []
+        self.n_subqueries = 0
+        # matching parenthesis of every '(' (or the last token if unbalanced)
+        self.match = {}
+        stack = []
+        for index, token in enumerate(self.tokens):
+            if token.text == '(':
+                stack.append(index)
+            elif token.text == ')' and len(stack) > 0:
+                self.match[stack.pop()] = index
+        for index in stack:
+            self.match[index] = len(self.tokens)
+
+    # ---- token helpers ----
+    def word(self, index):
+        """Lower case text of a word token, None for other tokens"""
+        if index < len(self.tokens) and self.tokens[index].kind == 'word':
+            return self.tokens[index].text.lower()
+        return None
+
+    def text(self, index):
+        return self.tokens[index].text if index < len(self.tokens) else None
+
+    def skip_words(self, index, words):
+        while self.word(index) in words:
+            index += 1
+        return index
+
+    def read_name(self, index, end):
+        """Read a dotted name, return (list of parts, next index)"""
+        parts = []
+        while index < end and self.tokens[index].kind in ('word', 'quoted'):
+            parts.append(unquote(self.tokens[index].text))
+            index += 1
+            if index + 1 < end and self.tokens[index].text == '.' and self.tokens[index + 1].kind in ('word', 'quoted'):
+                index += 1
+            else:
+                break
+        return parts, index
+
+    def read_alias(self, index, end):
+        """Read an optional `[AS] alias`, return (alias or None, next index)"""
+        if self.word(index) == 'as' and index + 1 < end:
+            return unquote(self.tokens[index + 1].text), index + 2
+        if index < end and self.tokens[index].kind in ('word', 'quoted') and self.word(index) not in NOT_ALIAS_WORDS:
+            return unquote(self.tokens[index].text), index + 1
+        return None, index
+
+    def split(self, start, end, separator=','):
+        """Split a token range on the separator found outside parentheses"""
+        parts, part_start, index = [], start, start
+        while index < end:
+            if self.tokens[index].text == '(':
+                index = self.match[index] + 1
+                continue
+            if self.tokens[index].text == separator:
+                parts.append((part_start, index))
+                part_start = index + 1
+            index += 1
+        parts.append((part_start, end))
+        return [(a, b) for a, b in parts if a < b]
+
+    def find_words(self, start, end, words):
+        """Positions of the given words found outside parentheses"""
+        found, index = [], start
+        while index < end:
+            if self.tokens[index].text == '(':
+                index = self.match[index] + 1
+                continue
+            if self.word(index) in words:
+                found.append(index)
+            index += 1
+        return found
+
+    def subquery_name(self, alias=None):
+        self.n_subqueries += 1
+        return f"{self.script_name}:{alias if alias else 'subquery_' + str(self.n_subqueries)}"
+
+    # ---- resolution ----
+    def node_of(self, source, column):
+        """The node of `column` read from a source of a scope"""
+        kind, value = source
+        if kind == 'table':
+            return (value, column)
+        if column.lower() in value.outputs:
+            return value.outputs[column.lower()]
+        # `select *` of a single table passes the columns through
+        star = value.outputs.get('*')
+        if star is not None and star[0] != value.name:
+            return (star[0], column)
+        return (value.name, column)
+
+    def resolve(self, parts, scope):
+        """The node referenced by a (dotted) column name inside a scope"""
+        column = parts[-1]
+        qualifier = '.'.join(parts[:-1]).lower()
+        current = scope
+        while current is not None:
+            if qualifier:
+                if qualifier in current.sources:
+                    return self.node_of(current.sources[qualifier], column)
+            else:
+                for source in current.sources.values():
+                    if source[0] == 'scope' and column.lower() in source[1].outputs:
+                        return self.node_of(source, column)
+            current = current.parent
+        if qualifier:
+            return ('.'.join(parts[:-1]), column)
+        # an unqualified column of the only table of the query
+        tables = {source[1] for source in scope.sources.values() if source[0] == 'table'}
+        if len(tables) == 1:
+            return (tables.pop(), column)
+        return ('?', column)
+
+    def star_nodes(self, qualifier, scope):
+        """The (output name, node) pairs of `qualifier.*` (or `*` if qualifier is None)"""
+        if qualifier is None:
+            sources = list({id(source[1]): source for source in scope.sources.values()}.values())
+        else:
+            source = scope.sources.get(qualifier.lower())
+            sources = [source] if source is not None else [('table', qualifier)]
+        pairs = []
+        for kind, value in sources:
+            if kind == 'table':
+                pairs.append(('*', (value, '*')))
+            else:
+                pairs.extend((node[1], node) for node in value.outputs.values())
+        return pairs
+
+    # ---- parsing ----
+    def references(self, start, end, scope):
+        """The nodes of the columns used by an expression"""
+        nodes, index = [], start
+        while index < end:
+            token = self.tokens[index]
+            if token.text == '(':
+                if self.word(index + 1) in ('select', 'with'):
+                    # scalar subquery, depends on its output columns
+                    child = self.parse_query(index + 1, self.match[index], self.subquery_name(), scope)
+                    nodes.extend(child.outputs.values())
+                    index = self.match[index] + 1
+                else:
+                    index += 1
+                continue
+            if token.kind not in ('word', 'quoted'):
+                index += 1
+                continue
+            # type name of CAST(x AS type)
+            if index > start and self.word(index - 1) == 'as':
+                index += 1
+                continue
+            parts, following = self.read_name(index, end)
+            # function call
+            if following < end and self.tokens[following].text == '(':
+                index = following
+                continue
+            # qualified star
+            if following + 1 < end and self.tokens[following].text == '.' and self.tokens[following + 1].text == '*':
+                nodes.extend(node for _, node in self.star_nodes('.'.join(parts), scope))
+                index = following + 2
+                continue
+            if len(parts) > 1 or token.kind == 'quoted' or self.word(index) not in KEYWORDS:
+                nodes.append(self.resolve(parts, scope))
+            index = following
+        return nodes
+
+    def parse_from(self, start, end, scope):
+        """Register the tables and subqueries of a FROM clause in the scope"""
+        index = start
+        while index < end:
+            token = self.tokens[index]
+            word = self.word(index)
+            if token.text == ',' or word in JOIN_WORDS:
+                index += 1
+            elif word in ('on', 'using'):
+                # skip the join condition
+                index += 1
+                while index < end and self.tokens[index].text != ',' and self.word(index) not in JOIN_WORDS:
+                    index = self.match[index] + 1 if self.tokens[index].text == '(' else index + 1
+            elif token.text == '(':
+                close = self.match[index]
+                alias, following = self.read_alias(close + 1, end)
+                if self.word(index + 1) in ('select', 'with'):
+                    child = self.parse_query(index + 1, close, self.subquery_name(alias), scope)
+                    if alias:
+                        scope.sources[alias.lower()] = ('scope', child)
+                else:
+                    # parenthesized joins
+                    self.parse_from(index + 1, close, scope)
+                index = following
+            elif token.kind in ('word', 'quoted'):
+                parts, following = self.read_name(index, end)
+                # table valued function
+                if following < end and self.tokens[following].text == '(':
+                    following = self.match[following] + 1
+                name = '.'.join(parts)
+                alias, following = self.read_alias(following, end)
+                cte = scope.ctes.get(name.lower())
+                source = ('scope', cte) if cte is not None else ('table', name)
+                if alias:
+                    scope.sources[alias.lower()] = source
+                scope.sources.setdefault(name.lower(), source)
+                scope.sources.setdefault(parts[-1].lower(), source)
+                index = following
+            else:
+                index += 1
+
+    def parse_select(self, start, end, scope, parent, output_names=None):
+        """Parse one SELECT (no UNION) whose outputs belong to `scope`"""
+        # the branch has its own sources, the outputs are shared by the union
+        branch = _Scope(scope.name, parent, scope.ctes)
+        select_at = self.find_words(start, end, {'select'})
+        if len(select_at) == 0:
+            return
+        list_start = self.skip_words(select_at[0] + 1, {'distinct', 'all', 'unique'})
+        if self.word(list_start) == 'top':
+            list_start += 2
+        clause_at = [index for index in self.find_words(list_start, end, SELECT_END_WORDS)]
+        list_end = clause_at[0] if len(clause_at) > 0 else end
+        from_at = [index for index in clause_at if self.word(index) == 'from']
+        if len(from_at) > 0:
+            from_end = [index for index in clause_at if index > from_at[0] and self.word(index) in FROM_END_WORDS]
+            self.parse_from(from_at[0] + 1, from_end[0] if len(from_end) > 0 else end, branch)
+        # the outputs of the first branch name the columns of the union
+        first_branch = len(scope.outputs) == 0
+        existing = list(scope.outputs.values())
+        position = 0
+        for item_start, item_end in self.split(list_start, list_end):
+            # `[qualifier.]*`
+            if self.tokens[item_end - 1].text == '*' and item_end - item_start in (1, 3):
+                qualifier = unquote(self.tokens[item_start].text) if item_end - item_start == 3 else None
+                for column, node in self.star_nodes(qualifier, branch):
+                    position = self.add_output(scope, first_branch, existing, position, column, [node], 'direct', output_names)
+                continue
+            alias, expression_end = None, item_end
+            if item_end - item_start >= 2 and self.word(item_end - 2) == 'as':
+                alias, expression_end = unquote(self.tokens[item_end - 1].text), item_end - 2
+            elif item_end - item_start >= 2 and self.tokens[item_end - 1].kind in ('word', 'quoted') \
+                    and self.word(item_end - 1) not in NOT_ALIAS_WORDS and self.tokens[item_end - 2].text != '.' \
+                    and (self.tokens[item_end - 2].text == ')' or (self.tokens[item_end - 2].kind in ('word', 'quoted', 'number', 'string')
+                                                                   and self.word(item_end - 2) not in KEYWORDS)):
+                alias, expression_end = unquote(self.tokens[item_end - 1].text), item_end - 1
+            parts, following = self.read_name(item_start, expression_end)
+            single_column = following == expression_end and len(parts) > 0
+            column = alias or (parts[-1] if single_column else f'expr_{position + 1}')
+            if any(self.word(index) == 'case' for index in range(item_start, expression_end)):
+                kind = 'case'
+            else:
+                kind = 'direct' if single_column else 'expression'
+            nodes = self.references(item_start, expression_end, branch)
+            position = self.add_output(scope, first_branch, existing, position, column, nodes, kind, output_names)
+
+    def add_output(self, scope, first_branch, existing, position, column, nodes, kind, output_names):
+        """Add one output column of a select and its edges, return the next position"""
+        if first_branch:
+            if output_names is not None and position < len(output_names):
+                column = output_names[position]
+            node = (scope.name, column)
+            scope.outputs.setdefault(column.lower(), node)
+        elif position < len(existing):
+            node = existing[position]
+        else:
+            return position + 1
+        for source in nodes:
+            if source != node:
+                self.edges.append((node, source, kind))
+        return position + 1
+
+    def parse_query(self, start, end, name, parent, output_names=None):
+        """Parse a query (WITH, UNION and parentheses included) into a scope named `name`"""
+        scope = _Scope(name, parent, dict(parent.ctes) if parent is not None else {})
+        index = start
+        # common table expressions
+        if self.word(index) == 'with':
+            index = self.skip_words(index + 1, {'recursive'})
+            while index < end:
+                parts, index = self.read_name(index, end)
+                if index < end and self.tokens[index].text == '(':
+                    index = self.match[index] + 1
+                index = self.skip_words(index, {'as', 'not', 'materialized'})
+                if not parts or index >= end or self.tokens[index].text != '(':
+                    break
+                cte = self.parse_query(index + 1, self.match[index], f"{self.script_name}:{parts[-1]}", scope)
+                scope.ctes[parts[-1].lower()] = cte
+                index = self.match[index] + 1
+                if self.text(index) != ',':
+                    break
+                index += 1
+        # union branches
+        bounds = [index] + [position for position in self.find_words(index, end, {'union', 'intersect', 'except'})] + [end]
+        for branch_start, branch_end in zip(bounds[:-1], bounds[1:]):
+            branch_start = self.skip_words(branch_start, {'union', 'intersect', 'except', 'all', 'distinct'})
+            # parenthesized branch
+            if self.text(branch_start) == '(' and self.match[branch_start] >= branch_end - 1:
+                branch_start, branch_end = branch_start + 1, self.match[branch_start]
+                if self.word(branch_start) == 'with' or len(self.find_words(branch_start, branch_end, {'union', 'intersect', 'except'})) > 0:
+                    inner = self.parse_query(branch_start, branch_end, self.subquery_name(), scope)
+                    for position, node in enumerate(inner.outputs.values()):
+                        self.add_output(scope, position >= len(scope.outputs), list(scope.outputs.values()), position,
+                                        node[1], [node], 'direct', output_names)
+                    continue
+            self.parse_select(branch_start, branch_end, scope, scope, output_names)
+        return scope
+
+    def parse_update(self, start, end, target):
+        """UPDATE target SET col = expression, ... [FROM ...] [WHERE ...]"""
+        scope = _Scope(target, None)
+        clause_at = self.find_words(start, end, {'set', 'from', 'where'})
+        set_at = [index for index in clause_at if self.word(index) == 'set']
+        if len(set_at) == 0:
+            return
+        after_set = [index for index in clause_at if index > set_at[0]]
+        set_end = after_set[0] if len(after_set) > 0 else end
+        # the target (and its alias) and the FROM clause are the sources
+        self.parse_from(start, set_at[0], scope)
+        from_at = [index for index in after_set if self.word(index) == 'from']
+        if len(from_at) > 0:
+            where_at = [index for index in after_set if self.word(index) == 'where']
+            self.parse_from(from_at[0] + 1, where_at[0] if len(where_at) > 0 else end, scope)
+        for item_start, item_end in self.split(set_at[0] + 1, set_end):
+            equal = [index for index in range(item_start, item_end) if self.tokens[index].text == '=']
+            if len(equal) == 0:
+                continue
+            parts, _ = self.read_name(item_start, equal[0])
+            if not parts:
+                continue
+            node = (target, parts[-1])
+            kind = 'case' if any(self.word(index) == 'case' for index in range(equal[0], item_end)) else 'expression'
+            for source in self.references(equal[0] + 1, item_end, scope):
+                if source != node:
+                    self.edges.append((node, source, kind))
+
+    def parse_statement(self, start, end):
+        """Parse one statement of the script"""
+        word = self.word(start)
+        # skip the header of procedures: CREATE PROCEDURE name ... AS [BEGIN]
+        if word in ('create', 'alter'):
+            position = self.skip_words(start + 1, CREATE_MODIFIERS)
+            what = self.word(position)
+            if what in ('procedure', 'proc', 'function', 'trigger'):
+                body = self.find_words(position, end, {'select', 'insert', 'update', 'with'})
+                if len(body) > 0:
+                    self.parse_statement(body[0], end)
+                return
+            if what in ('table', 'view'):
+                position = self.skip_words(position + 1, {'if', 'not', 'exists'})
+                parts, position = self.read_name(position, end)
+                columns = None
+                if self.text(position) == '(' and self.word(position + 1) not in ('select', 'with'):
+                    columns = [unquote(self.tokens[a].text) for a, _ in self.split(position + 1, self.match[position])]
+                    position = self.match[position] + 1
+                query = self.find_words(position, end, {'select', 'with'})
+                if parts and len(query) > 0:
+                    self.parse_query(query[0], end, '.'.join(parts), None, columns)
+            return
+        if word == 'insert':
+            position = self.skip_words(start + 1, {'into', 'overwrite', 'table', 'ignore'})
+            parts, position = self.read_name(position, end)
+            columns = None
+            if self.text(position) == '(' and self.word(position + 1) not in ('select', 'with'):
+                columns = [unquote(self.tokens[a].text) for a, _ in self.split(position + 1, self.match[position])]
+                position = self.match[position] + 1
+            query = self.find_words(position, end, {'select', 'with'})
+            if parts and len(query) > 0:
+                self.parse_query(query[0], end, '.'.join(parts), None, columns)
+            return
+        if word == 'update':
+            parts, _ = self.read_name(self.skip_words(start + 1, {'only'}), end)
+            if parts:
+                self.parse_update(start + 1, end, '.'.join(parts))
+            return
+        if word in ('select', 'with') or self.text(start) == '(':
+            # SELECT ... INTO target
+            name = self.script_name
+            into = self.find_words(start, end, {'into'})
+            if len(into) > 0:
+                parts, _ = self.read_name(self.skip_words(into[0] + 1, {'temporary', 'temp', 'unlogged', 'table'}), end)
+                name = '.'.join(parts) if parts else name
+            self.parse_query(start, end, name, None)
+
+    def parse(self):
+        """Parse every statement and return the edges"""
+        for start, end in self.split(0, len(self.tokens), ';'):
+            self.parse_statement(start, end)
+        # a column used twice in an expression gives the same edge twice
+        return list(dict.fromkeys(self.edges))
+
+def extract_column_lineage(script, script_name='script', tokens=None):
+    """Return the column lineage edges of a sql script
+
+    Parameters
+    -----------
+    script: str
+        the sql script
+
+    script_name: str
+        name given to the outputs of a script which writes no table, and prefix
+        of its subquery names (default: 'script')
+
+    tokens: list of Token (optional)
+        the tokens of the script, if already computed
+
+    Returns
+    --------
+    list of (column, source column, kind), with columns as (scope, name) pairs and
+    kind one of 'direct', 'expression' or 'case'
+    """
+    if tokens is None:
+        tokens = tokenize_sql(script)
+    return _ColumnLineageParser(tokens, script_name).parse()
+
+class ColumnLineageIndex:
+    """Indexed column lineage graph
+
+    Columns are interned as integers with their sources and dependents stored
+    in per column dictionaries, so a lookup costs a few dictionary accesses and
+    a traversal only visits the columns it returns. The origins of every column
+    are memoised, the walk of a column reusing those of the columns it reaches,
+    and so are the origins, sources and dependents of every name looked up,
+    until the next edge is added.
+    """
+    def __init__(self):
+        self.columns = []
+        self._ids = {}
+        self._sources = []
+        self._dependents = []
+        # 'column' and 'scope.column' (lower case) -> column ids
+        self._by_name = {}
+        self.n_scripts = 0
+        # column id -> ids of its origins, name -> origins, (direction, name,
+        # transitive) -> sources or dependents (cleared by add_edge)
+        self._origin_ids = {}
+        self._origins = {}
+        self._walks = {}
+
+    def __len__(self):
+        return sum(len(sources) for sources in self._sources)
+
+    def _intern(self, node):
+        column_id = self._ids.get(node)
+        if column_id is None:
+            column_id = self._ids[node] = len(self.columns)
+            self.columns.append(node)
+            self._sources.append({})
+            self._dependents.append(set())
+            scope, name = node
+            short_scope = scope.split(':')[-1]
+            for key in {name.lower(), f'{scope}.{name}'.lower(), f'{short_scope}.{name}'.lower(),
+                        f"{short_scope.split('.')[-1]}.{name}".lower()}:
+                self._by_name.setdefault(key, set()).add(column_id)
+        return column_id
+
+    def add_edge(self, column, source, kind='direct'):
+        """Add `column` <- `source`, both as (scope, name) pairs"""
+        column_id, source_id = self._intern(column), self._intern(source)
+        self._sources[column_id][source_id] = kind
+        self._dependents[source_id].add(column_id)
+        self._origin_ids.clear()
+        self._origins.clear()
+        self._walks.clear()
+
+    def add_edges(self, edges):
+        for column, source, kind in edges:
+            self.add_edge(column, source, kind)
+        return self
+
+    def add_script(self, script, name=None):
+        """Parse a script and add its column lineage"""
+        self.n_scripts += 1
+        return self.add_edges(extract_column_lineage(script, name or f'script_{self.n_scripts}'))
+
+    def lookup(self, column):
+        """Return the (scope, name) columns matching 'name', 'table.name' or 'schema.table.name'"""
+        return [self.columns[column_id] for column_id in sorted(self._by_name.get(column.lower(), ()))]
+
+    def _walk(self, column, direction, transitive):
+        """Return the columns linked to `column` in a direction ('sources' or 'dependents'), memoised"""
+        key = (direction, column.lower(), transitive)
+        if key not in self._walks:
+            links = self._sources if direction == 'sources' else self._dependents
+            seen, frontier = set(), list(self._by_name.get(key[1], ()))
+            while frontier:
+                column_id = frontier.pop()
+                for linked in links[column_id]:
+                    if linked not in seen:
+                        seen.add(linked)
+                        if transitive:
+                            frontier.append(linked)
+            self._walks[key] = [self.columns[column_id] for column_id in sorted(seen)]
+        return list(self._walks[key])
+
+    def sources(self, column, transitive=True):
+        """Where does `column` come from: the columns it is computed from"""
+        return self._walk(column, 'sources', transitive)
+
+    def dependents(self, column, transitive=True):
+        """What depends on `column`: the columns computed from it"""
+        return self._walk(column, 'dependents', transitive)
+
+    def _column_origins(self, column_id):
+        """Return the ids of the origins of a column, memoised"""
+        origin_ids = self._origin_ids.get(column_id)
+        if origin_ids is not None:
+            return origin_ids
+        origin_ids, seen, frontier = set(), set(), [column_id]
+        while frontier:
+            for linked in self._sources[frontier.pop()]:
+                if linked in seen:
+                    continue
+                seen.add(linked)
+                if len(self._sources[linked]) == 0:
+                    origin_ids.add(linked)
+                elif linked in self._origin_ids:
+                    # the origins of a column are all the columns it reaches
+                    origin_ids |= self._origin_ids[linked]
+                else:
+                    frontier.append(linked)
+        origin_ids = self._origin_ids[column_id] = frozenset(origin_ids)
+        return origin_ids
+
+    def origins(self, column):
+        """The source columns of `column` which are not computed from anything"""
+        key = column.lower()
+        if key not in self._origins:
+            origin_ids = set()
+            for column_id in self._by_name.get(key, ()):
+                origin_ids |= self._column_origins(column_id)
+            self._origins[key] = [self.columns[column_id] for column_id in sorted(origin_ids)]
+        return list(self._origins[key])
+
+    def edges(self):
+        """Iterate over (column, source, kind)"""
+        for column_id, sources in enumerate(self._sources):
+            for source_id, kind in sources.items():
+                yield self.columns[column_id], self.columns[source_id], kind
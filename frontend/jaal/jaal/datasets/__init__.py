@@ -1 +1,3 @@
-from .load_got import load_got
\ No newline at end of file
+from .load_got import load_got
+from .degree import compute_node_degrees, add_node_weight
+from .title import DEFAULT_TITLE_TEMPLATE, build_node_titles, add_node_title
@@ -0,0 +1,80 @@
+"""
+Compute the degree of every node from the edge data
+
+Both endpoint columns are encoded with a single hash pass and counted with
+`np.bincount`, so the cost is linear in the number of nodes and edges.
+"""
+
+# imports
+import numpy as np
+import pandas as pd
+
+def _as_str(values):
+    """Cast ids to string, skipping the copy when they already are"""
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        return values
+    return values.astype(str)
+
+def compute_node_degrees(edge_df, node_ids=None):
+    """Count the in, out and total degree of nodes
+
+    Parameters
+    -----------
+    edge_df: pandas dataframe
+        The network edge data, must contain 'from' and 'to' columns
+
+    node_ids: list-like (optional)
+        The node ids to report, in this order. If None, every node present in
+        the edge data is reported.
+
+    Returns
+    --------
+    degrees: pandas dataframe
+        Indexed by node id with 'in_degree', 'out_degree' and 'degree' columns.
+        'degree' counts every edge touching the node once, so a self loop adds 1.
+    """
+    # compare ids as string, the same way parse_dataframe does
+    source = _as_str(edge_df['from']).to_numpy(dtype=object)
+    target = _as_str(edge_df['to']).to_numpy(dtype=object)
+    n_edges = len(source)
+    # encode both endpoint columns with one hash pass
+    codes, uniques = pd.factorize(np.concatenate([source, target]))
+    source_codes, target_codes = codes[:n_edges], codes[n_edges:]
+    # count each side once
+    out_degree = np.bincount(source_codes, minlength=len(uniques))
+    in_degree = np.bincount(target_codes, minlength=len(uniques))
+    self_loops = np.bincount(source_codes[source_codes == target_codes], minlength=len(uniques))
+    degree = in_degree + out_degree - self_loops
+    # report every node of the edge data
+    if node_ids is None:
+        return pd.DataFrame({'in_degree': in_degree, 'out_degree': out_degree, 'degree': degree},
+                            index=pd.Index(uniques))
+    # otherwise align the counts on the requested nodes, nodes without edges get 0
+    index = pd.Index(_as_str(pd.Series(node_ids)).to_numpy(dtype=object))
+    position = pd.Index(uniques).get_indexer(index)
+    found = position >= 0
+    def take(counts):
+        values = np.zeros(len(index), dtype=counts.dtype)
+        values[found] = counts[position[found]]
+        return values
+    # return
+    return pd.DataFrame({'in_degree': take(in_degree), 'out_degree': take(out_degree), 'degree': take(degree)},
+                        index=index)
+
+def add_node_weight(node_df, edge_df, column='weight'):
+    """Add the total degree of every node as a column of node_df
+
+    Parameters
+    -----------
+    node_df: pandas dataframe
+        The network node data, must contain the 'id' column
+
+    edge_df: pandas dataframe
+        The network edge data, must contain 'from' and 'to' columns
+
+    column: str
+        name of the column to store the degree in (default: 'weight')
+    """
+    node_df[column] = compute_node_degrees(edge_df, node_df['id'])['degree'].to_numpy()
+    # return
+    return node_df
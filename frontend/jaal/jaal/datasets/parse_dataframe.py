@@ -4,6 +4,13 @@ Author: Mohit Mayank
 Parse network data from dataframe format into visdcc format 
 """
 
+# imports
+import numpy as np
+import pandas as pd
+
+# ways of scaling a numerical column into sizes
+SCALING_MODES = ['linear', 'log', 'quantile']
+
 def compute_scaling_vars_for_numerical_cols(df):
     """Identify and scale numerical cols"""
     # identify numerical cols
@@ -18,6 +25,46 @@ def compute_scaling_vars_for_numerical_cols(df):
     # return
     return scaling_vars
 
+def scale_values(values, minn=None, maxx=None, mode='linear', max_size=20):
+    """Scale numerical values into [0, max_size], missing values and constant columns giving 0
+
+    Parameters
+    -----------
+    values: array like
+        the values of a numerical column
+
+    minn, maxx: float (optional)
+        the min and max of the column, see compute_scaling_vars_for_numerical_cols
+        (default: the min and max of values)
+
+    mode: str
+        'linear', 'log' (log of the distance to the min, for skewed columns) or
+        'quantile' (rank of the value) (default: 'linear')
+
+    max_size: float
+        the scaled value of the max (default: 20)
+    """
+    if mode not in SCALING_MODES:
+        raise Exception(f"Unknown scaling mode '{mode}', expected one of {SCALING_MODES}.")
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    if missing.all():
+        return np.zeros(len(values))
+    minn = np.nanmin(values) if minn is None or pd.isna(minn) else float(minn)
+    maxx = np.nanmax(values) if maxx is None or pd.isna(maxx) else float(maxx)
+    span = maxx - minn
+    if mode == 'quantile':
+        ranks = pd.Series(values).rank(method='average').to_numpy()
+        count = len(values) - missing.sum()
+        scaled = (ranks - 1) / (count - 1) if count > 1 else np.zeros(len(values))
+    elif span <= 0:
+        scaled = np.zeros(len(values))
+    elif mode == 'log':
+        scaled = np.log1p(np.clip(values - minn, 0, span)) / np.log1p(span)
+    else:
+        scaled = np.clip((values - minn) / span, 0, 1)
+    return np.where(missing, 0, scaled * max_size)
+
 def parse_dataframe(edge_df, node_df=None):
     """Parse the network dataframe into visdcc format
 
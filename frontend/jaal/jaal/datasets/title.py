@@ -0,0 +1,64 @@
+"""
+Build the hover title (tooltip) of every node from the node data
+
+The title is assembled column by column with vectorized string operations
+instead of indexing the dataframe row by row.
+"""
+
+# imports
+import pandas as pd
+
+# each line of the title as (prefix, node column), lines are joined by '<br>'
+DEFAULT_TITLE_TEMPLATE = [
+    ('Name:', 'id'),
+    ('Number of edges:', 'weight'),
+    ('Type:', 'type_desc'),
+    ('Create date: ', 'create_date'),
+    ('Modify date: ', 'modify_date'),
+]
+
+def build_node_titles(node_df, template=None):
+    """Return the title of every node as a pandas series aligned with node_df
+
+    Parameters
+    -----------
+    node_df: pandas dataframe
+        The network node data
+
+    template: list of (prefix, column) (optional)
+        The lines of the title. Lines whose column is missing from node_df are
+        skipped and missing values are shown empty. (default: DEFAULT_TITLE_TEMPLATE)
+    """
+    if template is None:
+        template = DEFAULT_TITLE_TEMPLATE
+    # build one string column per line of the template
+    lines = []
+    for prefix, column in template:
+        if column not in node_df.columns:
+            continue
+        values = node_df[column]
+        values = values.astype(str).where(values.notna(), '')
+        lines.append(prefix + values)
+    # nothing to show
+    if len(lines) == 0:
+        return pd.Series('', index=node_df.index)
+    # join the lines
+    return lines[0].str.cat(lines[1:], sep='<br>') if len(lines) > 1 else lines[0]
+
+def add_node_title(node_df, template=None, column='title'):
+    """Add the title of every node as a column of node_df
+
+    Parameters
+    -----------
+    node_df: pandas dataframe
+        The network node data
+
+    template: list of (prefix, column) (optional)
+        The lines of the title (default: DEFAULT_TITLE_TEMPLATE)
+
+    column: str
+        name of the column to store the title in (default: 'title')
+    """
+    node_df[column] = build_node_titles(node_df, template).to_numpy()
+    # return
+    return node_df
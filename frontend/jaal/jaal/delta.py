@@ -0,0 +1,117 @@
+"""
+Send only the changes of the graph to the browser
+
+The server remembers, per session, the nodes and edges it last sent to the
+visdcc.Network. A change is then sent as a small javascript patch, run by the
+`run` property of the network, updating its node and edge DataSets (`this.nn`
+and `this.ee`) in place instead of replacing its whole `data` property.
+
+The browser holds the whole graph, the nodes and edges left out by the search
+and filters being hidden, so a filter change only flips their `hidden` flag.
+"""
+
+# imports
+import json
+from .payload import RENDER_FIELDS, render_graph
+from .graph_model import item_ids
+
+def _copy(item):
+    """Copy of a node or edge dict, nested dicts (e.g. the edge color) included"""
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in item.items()}
+
+def _same(a, b):
+    """a == b, with missing values (NaN) equal to themselves"""
+    return a is b or a == b or (a != a and b != b)
+
+def with_hidden(data, shown, fields=RENDER_FIELDS):
+    """Return all the nodes and edges of data, those missing from `shown` being hidden
+
+    Parameters
+    -----------
+    data: dict or GraphModel
+        the whole graph
+
+    shown: dict
+        the part of the graph to show (e.g. the filtered data)
+
+    fields: dict
+        the attributes sent to the browser, see render_graph (default: RENDER_FIELDS)
+    """
+    view = render_graph(data, fields)
+    for kind in ('nodes', 'edges'):
+        if view[kind] is data[kind]:
+            view[kind] = [dict(item) for item in view[kind]]
+        shown_ids = set(item_ids(shown[kind]))
+        for item in view[kind]:
+            item['hidden'] = item['id'] not in shown_ids
+    return view
+
+def snapshot(data):
+    """Return what the browser holds after receiving data, as {'nodes': {id: dict}, 'edges': {id: dict}}"""
+    return {kind: {item['id']: _copy(item) for item in data[kind]} for kind in ('nodes', 'edges')}
+
+def diff_items(sent, items):
+    """Compare the items with the ones sent before
+
+    Parameters
+    -----------
+    sent: dict
+        id -> item as last sent
+
+    items: list of dict
+        the items to show now
+
+    Returns
+    --------
+    (ids to remove, updates, new sent) where an update holds the id and the
+    changed attributes of an item (all of them for a new item)
+    """
+    updates = []
+    new_sent = {}
+    for item in items:
+        key = item['id']
+        copy = new_sent[key] = _copy(item)
+        before = sent.get(key)
+        if before is None:
+            updates.append(copy)
+        elif before != copy:
+            changed = {name: value for name, value in copy.items() if name not in before or not _same(before[name], value)}
+            # attributes which disappeared are reset
+            changed.update({name: None for name in before if name not in copy})
+            if len(changed) == 0:
+                continue
+            changed['id'] = key
+            updates.append(changed)
+    removed = [key for key in sent if key not in new_sent]
+    return removed, updates, new_sent
+
+def graph_patch(sent, data):
+    """Return (javascript patch, new sent) turning the graph `sent` into data in the browser
+
+    The patch is empty if nothing changed. If sent is None (what the browser
+    holds is unknown) the patch replaces all the nodes and edges.
+    """
+    statements = []
+    if sent is None:
+        statements.append("this.nn.clear();this.ee.clear();")
+        sent = {'nodes': {}, 'edges': {}}
+    new_sent = {}
+    for kind, dataset in (('nodes', 'this.nn'), ('edges', 'this.ee')):
+        removed, updates, new_sent[kind] = diff_items(sent[kind], data[kind])
+        if len(removed) > 0:
+            statements.append(f"{dataset}.remove({json.dumps(removed, default=str)});")
+        # showing or hiding items (the search and filters) only sends their ids
+        toggles = {True: [], False: []}
+        other_updates = []
+        for update in updates:
+            if len(update) == 2 and 'hidden' in update:
+                toggles[bool(update['hidden'])].append(update['id'])
+            else:
+                other_updates.append(update)
+        for hidden, ids in toggles.items():
+            if len(ids) > 0:
+                statements.append(f"{dataset}.update({json.dumps(ids, default=str)}.map(function(i)"
+                                  f"{{return {{id: i, hidden: {'true' if hidden else 'false'}}};}}));")
+        if len(other_updates) > 0:
+            statements.append(f"{dataset}.update({json.dumps(other_updates, default=str)});")
+    return "".join(statements), new_sent
@@ -0,0 +1,173 @@
+"""
+Columnar tables of the graph data and memoized filter queries
+
+The node and edge tables of a GraphModel are queried as they are. A filter
+query is evaluated on the dataframe into a boolean mask, cached by the text of
+the query, and the nodes and edges are then picked by position.
+
+The search and the node and edge filters are stages of a FilterPipeline: a
+stage keeps its masks until its own input changes, and the graph shown is the
+intersection of the masks of all the stages.
+"""
+
+# imports
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .cache import LRUCache
+from .graph_model import take
+
+class GraphTables:
+    """Node and edge dataframes of a graph, with memoized filter masks
+    """
+    def __init__(self, data, cache_size=32):
+        """
+        Parameters
+        -------------
+        data: GraphModel
+            the graph, whose tables are used (and modified by set_column) in place
+
+        cache_size: int
+            number of filter masks kept (default: 32)
+        """
+        self.tables = data.tables
+        self._masks = LRUCache(maxsize=cache_size)
+        self._groups = {}
+
+    @property
+    def node_df(self):
+        return self.tables['nodes']
+
+    @property
+    def edge_df(self):
+        return self.tables['edges']
+
+    def mask(self, kind, query):
+        """Return the boolean mask of the rows matching a pandas query
+
+        Parameters
+        -----------
+        kind: str
+            'nodes' or 'edges'
+
+        query: str
+            the filter, in pandas query syntax (None or empty keeps every row)
+        """
+        df = self.tables[kind]
+        if query is None or query.strip() == "":
+            return np.ones(len(df), dtype=bool)
+        def evaluate():
+            result = df.eval(query)
+            if not isinstance(result, pd.Series) or result.dtype != bool:
+                raise Exception(f"Filter query '{query}' is not a condition.")
+            return result.to_numpy()
+        return self._masks.get_or_compute((kind, query), evaluate)
+
+    def groups(self, column, kind='nodes'):
+        """Return (codes, values) numbering the nodes (or edges) by their value of a column
+
+        codes holds the position in values of the value of every row, the
+        missing values being grouped as '(missing)'.
+        """
+        if (kind, column) not in self._groups:
+            df = self.tables[kind]
+            if column not in df.columns:
+                raise Exception(f"Column '{column}' not found in the {kind}.")
+            series = df[column].astype(object)
+            codes, values = pd.factorize(series.where(series.notna(), '(missing)'))
+            self._groups[(kind, column)] = (codes.astype(np.int64), list(values))
+        return self._groups[(kind, column)]
+
+    def set_column(self, kind, column, values):
+        """Replace the values of a column (e.g. the colors), forgetting the masks and groups computed before"""
+        self.tables[kind][column] = values
+        self._masks.clear()
+        self._groups = {key: value for key, value in self._groups.items() if key != (kind, column)}
+
+def _pack(mask):
+    """Return a boolean mask (or None) as (bits, length)"""
+    return None if mask is None else (np.packbits(mask), len(mask))
+
+def _unpack(packed):
+    """Return the boolean mask of _pack"""
+    return None if packed is None else np.unpackbits(packed[0], count=packed[1]).astype(bool)
+
+class FilterPipeline:
+    """Stages filtering the nodes and edges of a graph, combined with a logical and
+
+    Every stage is stored with the key it was computed for (e.g. the query
+    text) and its node and edge masks (None keeps everything), so setting a
+    stage to its current key computes nothing.
+    """
+    def __init__(self):
+        # name -> (key, node mask, edge mask)
+        self.stages = OrderedDict()
+        self.n_computed = 0
+        self._result = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the picked nodes and edges refer to the graph, picked again after loading
+        state['_result'] = None
+        # the masks are stored as bits
+        state['stages'] = OrderedDict((name, (key, _pack(node_mask), _pack(edge_mask)))
+                                      for name, (key, node_mask, edge_mask) in self.stages.items())
+        return state
+
+    def __setstate__(self, state):
+        state['stages'] = OrderedDict((name, (key, _unpack(node_mask), _unpack(edge_mask)))
+                                      for name, (key, node_mask, edge_mask) in state['stages'].items())
+        self.__dict__.update(state)
+
+    def set_stage(self, name, key, compute):
+        """Set the stage `name` for key, calling `compute()` -> (node mask, edge mask)
+        only if the stage was computed for another key. Return True if computed.
+        """
+        stage = self.stages.get(name)
+        if stage is not None and stage[0] == key:
+            return False
+        node_mask, edge_mask = compute()
+        self.stages[name] = (key, node_mask, edge_mask)
+        self.n_computed += 1
+        self._result = None
+        return True
+
+    def remove_stage(self, name):
+        """Remove the stage `name` (if present)"""
+        if self.stages.pop(name, None) is not None:
+            self._result = None
+
+    def key(self, name):
+        """Return the key the stage `name` was computed for (e.g. its query text), None if it is not set"""
+        stage = self.stages.get(name)
+        return None if stage is None else stage[0]
+
+    def invalidate(self, name):
+        """Keep the masks of the stage `name` but compute it again the next time it is set"""
+        if name in self.stages:
+            _, node_mask, edge_mask = self.stages[name]
+            self.stages[name] = (object(), node_mask, edge_mask)
+
+    def clear_result(self):
+        """Pick the nodes and edges again at the next apply (e.g. from a copy of the graph)"""
+        self._result = None
+
+    def masks(self, n_nodes, n_edges):
+        """Return the combined (node mask, edge mask)"""
+        node_mask = np.ones(n_nodes, dtype=bool)
+        edge_mask = np.ones(n_edges, dtype=bool)
+        for _, stage_node_mask, stage_edge_mask in self.stages.values():
+            if stage_node_mask is not None:
+                node_mask &= stage_node_mask
+            if stage_edge_mask is not None:
+                edge_mask &= stage_edge_mask
+        return node_mask, edge_mask
+
+    def apply(self, data):
+        """Return the nodes and edges of data kept by all the stages, as a new graph dict"""
+        if self._result is None:
+            nodes, edges = data['nodes'], data['edges']
+            node_mask, edge_mask = self.masks(len(nodes), len(edges))
+            self._result = {'nodes': take(nodes, np.flatnonzero(node_mask)),
+                            'edges': take(edges, np.flatnonzero(edge_mask))}
+        return self._result
@@ -0,0 +1,120 @@
+"""
+Indexes over the visdcc graph data, built once when a graph is loaded
+
+Nodes are numbered once and the edges are stored as compressed sparse rows
+(CSR) in both directions: the edges leaving (or entering) node i are
+`order[indptr[i]:indptr[i + 1]]`. A traversal expands a whole frontier of nodes
+at a time with numpy instead of scanning every edge for every node.
+"""
+
+# imports
+import numpy as np
+import pandas as pd
+
+# traversal directions
+DIRECTIONS = ['both', 'upstream', 'downstream']
+
+def _csr(keys, n_rows):
+    """Return (indptr, order) grouping the positions of keys by key"""
+    order = np.argsort(keys, kind='stable').astype(np.int64)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_rows), out=indptr[1:])
+    return indptr, order
+
+def _expand(indptr, order, frontier):
+    """Return the edge positions of the rows in frontier"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = counts.sum()
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # concatenate the ranges [start, start + count) of every row
+    shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return order[np.arange(total) + shift]
+
+class GraphIndex:
+    """Node label and adjacency index of a graph
+    """
+    def __init__(self, data):
+        """
+        Parameters
+        -------------
+        data: GraphModel
+            the graph, whose nodes are already numbered
+        """
+        self.data = data
+        self.node_ids = data.node_ids
+        self.node_position = pd.Index(self.node_ids)
+        # number of every node of data
+        self.node_codes = data.node_codes
+        self.source = data.source
+        self.target = data.target
+        self.n_edges = len(self.source)
+        # position in data of every numbered node, -1 for the edge ends missing from the nodes
+        self.code_position = np.full(len(self.node_ids), -1, dtype=np.int64)
+        self.code_position[self.node_codes] = np.arange(len(self.node_codes))
+        # outgoing and incoming edges of every node
+        self.out_indptr, self.out_order = _csr(self.source, len(self.node_ids))
+        self.in_indptr, self.in_order = _csr(self.target, len(self.node_ids))
+        # lower case label of every node of data
+        self.labels = pd.Index([label.lower() for label in data.labels()])
+
+    def find_nodes(self, label):
+        """Return the ids of the nodes whose label is `label` (case insensitive)"""
+        positions = self.labels.get_indexer_for([str(label).lower()])
+        return self.data.ids('nodes', positions[positions >= 0])
+
+    def traverse(self, node_ids, direction='both', depth=1):
+        """Breadth first search from the given nodes
+
+        Parameters
+        -----------
+        node_ids: list
+            ids of the nodes to start from
+
+        direction: str
+            'downstream' follows the edges, 'upstream' follows them backwards
+            and 'both' does both (default: 'both')
+
+        depth: int
+            maximum number of hops, None for no limit (default: 1)
+
+        Returns
+        --------
+        (node ids, edge ids) as sets, reached nodes including the start nodes,
+        and the edges followed to reach them
+        """
+        visited, followed = self._traverse(node_ids, direction, depth)
+        return set(self.node_ids[visited].tolist()), set(self.data.ids('edges', np.flatnonzero(followed)))
+
+    def masks(self, node_ids, direction='both', depth=1):
+        """Same as traverse, but return boolean masks aligned with the nodes and edges of data"""
+        visited, followed = self._traverse(node_ids, direction, depth)
+        return visited[self.node_codes], followed
+
+    def _traverse(self, node_ids, direction, depth):
+        """Return the (visited nodes, followed edges) masks of traverse, nodes by number"""
+        if direction not in DIRECTIONS:
+            raise Exception(f"Unknown direction '{direction}', expected one of {DIRECTIONS}.")
+        steps = []
+        if direction in ('both', 'downstream'):
+            steps.append((self.out_indptr, self.out_order, self.target))
+        if direction in ('both', 'upstream'):
+            steps.append((self.in_indptr, self.in_order, self.source))
+        visited = np.zeros(len(self.node_ids), dtype=bool)
+        followed = np.zeros(self.n_edges, dtype=bool)
+        frontier = self.node_position.get_indexer(pd.Index(list(node_ids), dtype=object))
+        frontier = np.unique(frontier[frontier >= 0]).astype(np.int64)
+        visited[frontier] = True
+        level = 0
+        while len(frontier) > 0 and (depth is None or level < depth):
+            reached = []
+            for indptr, order, ends in steps:
+                edges = _expand(indptr, order, frontier)
+                followed[edges] = True
+                reached.append(ends[edges])
+            reached = np.concatenate(reached)
+            frontier = np.unique(reached[~visited[reached]])
+            visited[frontier] = True
+            level += 1
+        return visited, followed
@@ -0,0 +1,184 @@
+"""
+Node positions computed on the server
+
+The positions of the nodes are computed once per graph, cached by the hash of
+its structure, and sent with the nodes as their `x` and `y`, so the network
+draws the graph at once instead of laying it out in the browser at every load.
+
+Two layouts are available: 'layered' (left to right layers of the lineage, as
+in a Sugiyama layout) and 'force' (Fruchterman-Reingold, for small graphs).
+"""
+
+# imports
+import warnings
+import numpy as np
+from .cache import LRUCache, content_hash
+from .graph_index import _expand
+
+# available layouts
+LAYOUTS = ['layered', 'force']
+
+# space between two layers and between two nodes of a layer
+LAYER_SPACING = 200
+NODE_SPACING = 40
+
+# largest graph laid out by the force layout, whose steps are quadratic
+MAX_FORCE_NODES = 3000
+
+# (graph hash, layout) -> (x, y) of the numbered nodes
+_positions = LRUCache(maxsize=8)
+
+def graph_hash(graph_index):
+    """Return a hash of the structure of an indexed graph (its numbered nodes and edges)"""
+    return content_hash(len(graph_index.node_ids), graph_index.source.tobytes(), graph_index.target.tobytes())
+
+def _layers(graph_index):
+    """Return the layer of every numbered node: the longest path to it from a source
+
+    The nodes of cycles are put in the layer where the remaining nodes all
+    have predecessors left, starting with the ones having the fewest.
+    """
+    n_nodes = len(graph_index.node_ids)
+    # without self loops
+    loops = np.bincount(graph_index.target[graph_index.source == graph_index.target], minlength=n_nodes)
+    remaining = np.bincount(graph_index.target, minlength=n_nodes) - loops
+    layer = np.full(n_nodes, -1, dtype=np.int64)
+    frontier = np.flatnonzero(remaining == 0)
+    level = 0
+    while True:
+        if len(frontier) == 0:
+            unplaced = np.flatnonzero(layer < 0)
+            if len(unplaced) == 0:
+                break
+            # break the cycles
+            frontier = unplaced[remaining[unplaced] == remaining[unplaced].min()]
+        layer[frontier] = level
+        edges = _expand(graph_index.out_indptr, graph_index.out_order, frontier)
+        targets = graph_index.target[edges]
+        targets = targets[(layer[targets] < 0)]
+        remaining -= np.bincount(targets, minlength=n_nodes)
+        frontier = np.unique(targets[remaining[targets] <= 0])
+        level += 1
+    return layer
+
+def _rank_in_layer(layer, keys):
+    """Return the rank of every node in its layer, ordered by keys"""
+    order = np.lexsort((keys, layer))
+    starts = np.searchsorted(layer[order], layer[order], side='left')
+    rank = np.empty(len(layer), dtype=np.int64)
+    rank[order] = np.arange(len(layer)) - starts
+    return rank
+
+def layered_layout(graph_index, sweeps=4):
+    """Return the (x, y) of the numbered nodes of graph_index in layers, from left to right
+
+    Parameters
+    -----------
+    graph_index: GraphIndex
+        the index of the graph
+
+    sweeps: int
+        number of passes ordering every layer by the mean position of the
+        neighbors in the previous (or next) layer, to reduce crossings (default: 4)
+    """
+    n_nodes = len(graph_index.node_ids)
+    layer = _layers(graph_index)
+    rank = _rank_in_layer(layer, np.arange(n_nodes))
+    source, target = graph_index.source, graph_index.target
+    forward = layer[source] < layer[target]
+    for sweep in range(sweeps):
+        # down the layers using the predecessors, then up using the successors
+        ends, others = (target, source) if sweep % 2 == 0 else (source, target)
+        ends, others = ends[forward], others[forward]
+        totals = np.bincount(ends, weights=rank[others], minlength=n_nodes)
+        counts = np.bincount(ends, minlength=n_nodes)
+        barycenter = np.where(counts > 0, totals / np.maximum(counts, 1), rank)
+        rank = _rank_in_layer(layer, barycenter)
+    sizes = np.bincount(layer)
+    x = layer * float(LAYER_SPACING)
+    y = (rank - (sizes[layer] - 1) / 2.0) * NODE_SPACING
+    return x, y
+
+def force_layout(graph_index, iterations=50, seed=0):
+    """Return the (x, y) of the numbered nodes of graph_index, placed by a force directed layout
+
+    Parameters
+    -----------
+    graph_index: GraphIndex
+        the index of the graph, of at most MAX_FORCE_NODES nodes
+
+    iterations: int
+        number of steps (default: 50)
+
+    seed: int
+        seed of the first random positions, the same graph always gets the
+        same positions (default: 0)
+    """
+    n_nodes = len(graph_index.node_ids)
+    if n_nodes > MAX_FORCE_NODES:
+        raise ValueError(f"The force layout is limited to {MAX_FORCE_NODES} nodes, use the layered layout.")
+    if n_nodes == 0:
+        return np.zeros(0), np.zeros(0)
+    rng = np.random.default_rng(seed)
+    # ideal distance between nodes, for an area growing with the number of nodes
+    k = float(NODE_SPACING) * 2
+    side = k * np.sqrt(n_nodes)
+    positions = rng.uniform(-side / 2, side / 2, size=(n_nodes, 2))
+    source, target = graph_index.source, graph_index.target
+    temperature = side / 10
+    for _ in range(iterations):
+        # repulsion between every pair of nodes
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=-1)), 0.01)
+        displacement = (delta * (k * k / distance ** 2)[:, :, None]).sum(axis=1)
+        # attraction along the edges
+        delta = positions[source] - positions[target]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=-1)), 0.01)
+        pull = delta * (distance / k)[:, None]
+        np.subtract.at(displacement, source, pull)
+        np.add.at(displacement, target, pull)
+        # move by at most the temperature, which cools down
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=-1)), 0.01)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= 0.95
+    return positions[:, 0], positions[:, 1]
+
+def graph_positions(graph_index, layout='layered'):
+    """Return the (x, y) of the numbered nodes of graph_index, computed once per graph structure
+
+    Parameters
+    -----------
+    graph_index: GraphIndex
+        the index of the graph
+
+    layout: str
+        'layered' or 'force' (default: 'layered'), graphs of more than
+        MAX_FORCE_NODES nodes getting the layered layout
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}', expected one of {LAYOUTS}.")
+    if layout == 'force' and len(graph_index.node_ids) > MAX_FORCE_NODES:
+        warnings.warn(f"The force layout is limited to {MAX_FORCE_NODES} nodes, "
+                      f"the {len(graph_index.node_ids)} nodes get the layered layout.")
+        layout = 'layered'
+    compute = layered_layout if layout == 'layered' else force_layout
+    return _positions.get_or_compute((graph_hash(graph_index), layout), lambda: compute(graph_index))
+
+def apply_layout(data, graph_index, layout='layered'):
+    """Set the `x` and `y` of the nodes of data (in place) and return data
+
+    Parameters
+    -----------
+    data: GraphModel
+        the graph
+
+    graph_index: GraphIndex
+        the index of data
+
+    layout: str
+        'layered' or 'force' (default: 'layered')
+    """
+    x, y = graph_positions(graph_index, layout)
+    data.set_column('nodes', 'x', x[graph_index.node_codes])
+    data.set_column('nodes', 'y', y[graph_index.node_codes])
+    return data
@@ -0,0 +1,279 @@
+"""
+Columnar in-memory model of a graph
+
+The nodes and edges are kept as two dataframes instead of one dict per node
+and edge: the nodes are numbered, the ends of the edges are categorical
+columns (integer codes into the node ids), the low cardinality columns stay
+categorical and the numerical ones are numpy arrays. The visdcc dicts
+({'id': ..., 'label': ..., 'color': ...}) are made only for the nodes and
+edges sent to the browser.
+
+`model['nodes']` and `model['edges']` are ItemLists: sequences of the visdcc
+dicts, made when read, which can be narrowed down (`take`) without making any.
+"""
+
+# imports
+import numpy as np
+import pandas as pd
+from .datasets.parse_dataframe import compute_scaling_vars_for_numerical_cols
+
+# default look of the nodes and edges, as set by parse_dataframe
+DEFAULT_NODE_SHAPE = 'dot'
+DEFAULT_NODE_SIZE = 7
+DEFAULT_EDGE_COLOR = '#97C2FC'
+
+# number of dicts made at a time when iterating over an ItemList
+ITERATION_BATCH = 10000
+
+class ItemList:
+    """The nodes (or edges) of a GraphModel, or some of them, as a sequence of visdcc dicts
+    """
+    def __init__(self, model, kind, positions=None):
+        """
+        Parameters
+        -------------
+        model: GraphModel
+            the graph
+
+        kind: str
+            'nodes' or 'edges'
+
+        positions: numpy array (optional)
+            the rows of the items in the table of the model (default: all the rows)
+        """
+        self.model, self.kind = model, kind
+        self._positions = positions
+
+    @property
+    def positions(self):
+        """The rows of the items in the table of the model"""
+        if self._positions is None:
+            return np.arange(len(self.model.tables[self.kind]))
+        return self._positions
+
+    def __len__(self):
+        return len(self.model.tables[self.kind]) if self._positions is None else len(self._positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(np.arange(len(self))[i])
+        if i < 0:
+            i += len(self)
+        return self.model.items(self.kind, self.positions[i:i + 1])[0]
+
+    def __iter__(self):
+        positions = self.positions
+        for start in range(0, len(positions), ITERATION_BATCH):
+            yield from self.model.items(self.kind, positions[start:start + ITERATION_BATCH])
+
+    def take(self, positions):
+        """Return the items at the given positions (in this list) as a new ItemList"""
+        positions = np.asarray(positions, dtype=np.int64)
+        return ItemList(self.model, self.kind, positions if self._positions is None else self._positions[positions])
+
+    def ids(self):
+        """Return the ids of the items"""
+        return self.model.ids(self.kind, self._positions)
+
+    def to_dicts(self, fields=None):
+        """Return the items as visdcc dicts with the given attributes (default: all)"""
+        return self.model.items(self.kind, self._positions, fields)
+
+def take(items, positions):
+    """Return the items (an ItemList or a list of dicts) at the given positions"""
+    if isinstance(items, ItemList):
+        return items.take(positions)
+    return [items[i] for i in positions]
+
+def item_ids(items):
+    """Return the ids of the items (an ItemList or a list of dicts)"""
+    if isinstance(items, ItemList):
+        return items.ids()
+    return [item['id'] for item in items]
+
+def to_dicts(items, fields=None):
+    """Return the items (an ItemList or a list of dicts) as a list of dicts with the given attributes"""
+    if isinstance(items, ItemList):
+        return items.to_dicts(fields)
+    if fields is None:
+        return items
+    return [{name: item[name] for name in fields if name in item} for item in items]
+
+def _shallow_table(df):
+    """Return a table of the rows of df numbered from 0, sharing its columns
+
+    Setting a column of the table (the graph columns, or set_column) replaces
+    it in the table only, so the columns of df (e.g. memory mapped from a
+    store) are neither copied nor modified.
+    """
+    table = df.copy(deep=False)
+    table.index = pd.RangeIndex(len(df))
+    return table
+
+class GraphModel:
+    """Node and edge tables of a graph, with its nodes numbered
+    """
+    def __init__(self, node_table, edge_table, node_ids, node_codes):
+        """
+        Parameters
+        -------------
+        node_table: pandas dataframe
+            one row per node, with its 'id', 'label', 'shape' and 'size'
+
+        edge_table: pandas dataframe
+            one row per edge, its 'from' and 'to' being categoricals of node_ids
+
+        node_ids: numpy array
+            the id of every numbered node, the nodes of node_table first then
+            the edge ends missing from it
+
+        node_codes: numpy array
+            the number of the node of every row of node_table
+        """
+        self.tables = {'nodes': node_table, 'edges': edge_table}
+        self.node_ids = node_ids
+        self.node_codes = node_codes
+
+    @classmethod
+    def from_dataframes(cls, edge_df, node_df=None):
+        """Build the model of the network dataframes, return (model, scaling_vars)
+
+        The same checks and defaults as parse_dataframe.
+
+        Parameters
+        -------------
+        edge_df: pandas dataframe
+                The network edge data stored in format of pandas dataframe
+
+        node_df: pandas dataframe (optional)
+                The network node data stored in format of pandas dataframe
+        """
+        # Data checks
+        if ('from' not in edge_df.columns) or ('to' not in edge_df.columns):
+            raise Exception("Edge dataframe missing either 'from' or 'to' column.")
+        if node_df is not None:
+            if 'id' not in node_df.columns:
+                raise Exception("Node dataframe missing 'id' column.")
+        scaling_vars = {'node': None, 'edge': None}
+        if node_df is not None:
+            scaling_vars['node'] = compute_scaling_vars_for_numerical_cols(node_df)
+        scaling_vars['edge'] = compute_scaling_vars_for_numerical_cols(edge_df)
+
+        # number the nodes, the nodes of node_df first
+        ends = [edge_df['from'].astype(str), edge_df['to'].astype(str)]
+        node_column = node_df['id'].astype(str) if node_df is not None else pd.Series([], dtype=object)
+        codes, node_ids = pd.factorize(pd.concat([node_column] + ends, ignore_index=True))
+        node_ids = np.asarray(node_ids, dtype=object)
+        n_rows, n_edges = len(node_column), len(edge_df)
+        source, target = codes[n_rows:n_rows + n_edges], codes[n_rows + n_edges:]
+
+        # the node table, every edge end being a node without node_df
+        if node_df is not None:
+            node_codes = codes[:n_rows].astype(np.int64)
+            node_table = _shallow_table(node_df)
+            node_table['id'] = node_column.to_numpy(dtype=object)
+        else:
+            node_codes = np.arange(len(node_ids), dtype=np.int64)
+            node_table = pd.DataFrame({'id': node_ids})
+        node_table['label'] = node_table['id']
+        node_table['shape'] = pd.Categorical([DEFAULT_NODE_SHAPE] * len(node_table))
+        node_table['size'] = np.full(len(node_table), DEFAULT_NODE_SIZE)
+
+        # the edge table, its ends as codes of the node ids
+        edge_table = _shallow_table(edge_df)
+        categories = pd.Index(node_ids, dtype=object)
+        edge_table['from'] = pd.Categorical.from_codes(source, categories=categories)
+        edge_table['to'] = pd.Categorical.from_codes(target, categories=categories)
+        edge_table['color'] = pd.Categorical([DEFAULT_EDGE_COLOR] * n_edges)
+        return cls(node_table, edge_table, node_ids, node_codes), scaling_vars
+
+    def __getitem__(self, kind):
+        return ItemList(self, kind)
+
+    def keys(self):
+        return ['nodes', 'edges']
+
+    @property
+    def node_table(self):
+        return self.tables['nodes']
+
+    @property
+    def edge_table(self):
+        return self.tables['edges']
+
+    @property
+    def source(self):
+        """The number of the start node of every edge"""
+        return self.tables['edges']['from'].cat.codes.to_numpy(dtype=np.int64)
+
+    @property
+    def target(self):
+        """The number of the end node of every edge"""
+        return self.tables['edges']['to'].cat.codes.to_numpy(dtype=np.int64)
+
+    def labels(self):
+        """Return the label of every node"""
+        return self.tables['nodes']['label'].astype(str).tolist()
+
+    def ids(self, kind, positions=None):
+        """Return the ids of the nodes (or edges) at the given rows (default: all)"""
+        table = self.tables[kind]
+        if kind == 'nodes':
+            column = table['id']
+            return (column if positions is None else column.iloc[positions]).tolist()
+        source, target = self.source, self.target
+        if positions is not None:
+            source, target = source[positions], target[positions]
+        node_ids = self.node_ids
+        return [f"{a}__{b}" for a, b in zip(node_ids[source].tolist(), node_ids[target].tolist())]
+
+    def items(self, kind, positions=None, fields=None):
+        """Return the nodes (or edges) at the given rows as visdcc dicts
+
+        Parameters
+        -----------
+        kind: str
+            'nodes' or 'edges'
+
+        positions: numpy array (optional)
+            the rows (default: all)
+
+        fields: list (optional)
+            the attributes of the dicts, the ones missing from the table are
+            left out (default: all the columns, and the 'id' of the edges)
+        """
+        table = self.tables[kind]
+        if fields is None:
+            fields = list(table.columns) + (['id'] if kind == 'edges' else [])
+        names, columns = [], []
+        for name in fields:
+            if kind == 'edges' and name == 'id':
+                values = self.ids(kind, positions)
+            elif name in table.columns:
+                column = table[name] if positions is None else table[name].iloc[positions]
+                values = column.tolist()
+                # the edge color is given as {'color': ...}
+                if kind == 'edges' and name == 'color':
+                    values = [{'color': value} for value in values]
+            else:
+                continue
+            names.append(name)
+            columns.append(values)
+        n_items = len(table) if positions is None else len(positions)
+        if len(columns) == 0:
+            return [{} for _ in range(n_items)]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    def set_column(self, kind, column, values):
+        """Set a column of the node (or edge) table, e.g. the colors, in place"""
+        self.tables[kind][column] = values
+
+    def copy(self, kinds=('nodes', 'edges')):
+        """Return a model whose node (and/or edge) table can be modified without changing this one"""
+        tables = {kind: table.copy() if kind in kinds else table for kind, table in self.tables.items()}
+        return GraphModel(tables['nodes'], tables['edges'], self.node_ids, self.node_codes)
+
+    def memory_usage(self):
+        """Return the bytes used by the tables and the node ids"""
+        return int(sum(table.memory_usage(deep=True).sum() for table in self.tables.values())
+                   + self.node_codes.nbytes + sum(len(str(node_id)) + 49 for node_id in self.node_ids))
@@ -0,0 +1,103 @@
+"""
+Streaming ingestion of the uploaded csv files
+
+dcc.Upload gives the contents of a file as a base64 data url. Instead of
+decoding the whole file to bytes, then to a str wrapped in io.StringIO, the
+file is decoded block by block while pandas reads it in chunks, with explicit
+dtypes: the ids are read as text and the low cardinality columns (e.g.
+`type_desc`, `schema_name`) as categoricals, so the peak memory stays close
+to the size of the final table.
+"""
+
+# imports
+import io
+import base64
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# dtypes of the known columns of the node and edge files (missing ones are ignored)
+UPLOAD_DTYPES = {
+    'id': str,
+    'from': str,
+    'to': str,
+    'schema_name': 'category',
+    'type_desc': 'category',
+}
+
+class Base64Reader(io.RawIOBase):
+    """Binary file reading the decoded bytes of base64 text, one block at a time
+    """
+    def __init__(self, text, block_size=1 << 20):
+        """
+        Parameters
+        -------------
+        text: str
+            the base64 text (without the data url header)
+
+        block_size: int
+            number of base64 characters decoded at a time, rounded to a
+            multiple of 4 (default: 1MB)
+        """
+        self._text = text
+        self._position = 0
+        self._block_size = max(block_size - block_size % 4, 4)
+        self._buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self._buffer) == 0 and self._position < len(self._text):
+            block = self._text[self._position:self._position + self._block_size]
+            self._position += self._block_size
+            self._buffer = memoryview(base64.b64decode(block))
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+def open_upload(contents):
+    """Return a binary file reading the decoded contents of a dcc.Upload file"""
+    content_type, content_string = contents.split(',', 1)
+    return io.BufferedReader(Base64Reader(content_string), buffer_size=1 << 20)
+
+def concat_chunks(chunks):
+    """Concatenate dataframes read in chunks, merging the categories of their categorical columns"""
+    if len(chunks) == 1:
+        return chunks[0]
+    categorical = [col for col in chunks[0].columns if isinstance(chunks[0][col].dtype, pd.CategoricalDtype)]
+    # the categories of a column empty in a chunk are floats, they are all made objects to be merged
+    merged = {col: union_categoricals([chunk[col].cat.set_categories(chunk[col].cat.categories.astype(object))
+                                       for chunk in chunks]) for col in categorical}
+    # the categorical columns are concatenated apart, as their categories differ
+    df = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    for col in categorical:
+        df[col] = merged[col]
+    return df[chunks[0].columns]
+
+def read_csv_upload(contents, dtype=None, chunksize=100000):
+    """Read a csv file uploaded with dcc.Upload into a dataframe, streaming it
+
+    Parameters
+    -----------
+    contents: str
+        the contents of the file, as given by dcc.Upload
+
+    dtype: dict
+        column -> dtype of the known columns (default: UPLOAD_DTYPES)
+
+    chunksize: int
+        number of rows read at a time (default: 100000)
+    """
+    if dtype is None:
+        dtype = UPLOAD_DTYPES
+    with open_upload(contents) as f:
+        header = pd.read_csv(f, nrows=0, encoding='utf-8').columns
+    dtype = {col: value for col, value in dtype.items() if col in header}
+    chunks = []
+    with open_upload(contents) as f:
+        for chunk in pd.read_csv(f, dtype=dtype, chunksize=chunksize, encoding='utf-8'):
+            chunks.append(chunk)
+    if len(chunks) == 0:
+        return pd.DataFrame(columns=header)
+    return concat_chunks(chunks)
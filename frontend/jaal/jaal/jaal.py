@@ -1,25 +1,119 @@
 # import
 import io
 import sys
+import uuid
 import base64
 import datetime
+import threading
 import dash
 from dash import dash_table
 from dash.dependencies import Input, Output, State
 import dash_html_components as html
+import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import visdcc
+import numpy as np
 import pandas as pd
-from .datasets.parse_dataframe import parse_dataframe
-from .layout import create_case_show2, get_options, get_app_layout, get_distinct_colors, create_color_legend, DEFAULT_COLOR, \
+from .datasets.parse_dataframe import scale_values
+from .datasets.degree import add_node_weight
+from .datasets.title import add_node_title
+from .cache import LRUCache, content_hash
+from .session import GraphState, SessionStore
+from .graph_model import GraphModel
+from .delta import with_hidden, snapshot, graph_patch
+from .payload import RENDER_FIELDS, payload_fields, render_graph
+from .clusters import cluster_graph
+from .graph_layout import apply_layout
+from .ingest import read_csv_upload
+from .store import load_graph
+from .layout import create_case_show2, get_options, get_app_layout, get_value_colors, create_color_legend, DEFAULT_COLOR, \
     DEFAULT_NODE_SIZE, DEFAULT_EDGE_SIZE, create_case_show, get_select_form_layout
-from .lineage import parse_subquery_and_case, parse_subquery_and_case2
+from .lineage import parse_subquery_and_case, parse_subquery_and_case2, build_table_lineage
+
+# sql scripts shown before any upload
+DEFAULT_SQL_SCRIPTS = ["""
+                   SELECT main_qry.*,
+                   subdays.DAYS_OFFER1,
+                   subdays.DAYS_OFFER2,
+                   subdays.DAYS_OFFER3
+            from (
+                     SELECT jr.id  as PROJECT_ID,
+                            5 * (DATEDIFF(ifnull(lc.creation_date, now()), jr.creation_date) DIV 7)
+                                + MID('0123444401233334012222340111123400001234000123440',
+                                      7 * WEEKDAY(jr.creation_date)
+                                      + WEEKDAY(ifnull(lc.creation_date, now())) + 1, 1)
+                                      as LIFETIME,
+                            count(distinct
+                                  case when jra.application_source = 'VERAMA'
+                                    then jra.id else null end)        NUM_APPLICATIONS,
+                            count(distinct jra.id) NUM_CANDIDATES,
+                            sum(case when jro.stage = 'DEAL' then 1 else 0 end) as NUM_CONTRACTED,
+                            sum(ifnull(IS_INTERVIEW, 0)) as NUM_INTERVIEWED,
+                            sum(ifnull(IS_PRESENTATION, 0)) as NUM_OFFERED
+                     from job_request jr
+                              left join job_request_application jra on jr.id = jra.job_request_id
+                              left join job_request_offer jro
+                              on jro.job_request_application_id = jra.id
+                              left join lifecycle lc on lc.object_id=jr.id
+                              and lc.lifecycle_object_type='JOB_REQUEST'
+                              and lc.event = 'JOB_REQUEST_CLOSED'
+                              left join (SELECT jro2.job_request_application_id,
+                                                max(case
+                                                        when jro2.first_interview_scheduled_date
+                                                        is not null then 1
+                                                        else 0 end) as IS_INTERVIEW,
+                                                max(case when jro2.first_presented_date is not null
+                                                then 1 else 0 end) as IS_PRESENTATION
+                                         from job_request_offer jro2
+                                         group by 1) jrah2
+                                         on jra.id = jrah2.job_request_application_id
+                              left join client u on jr.client_id = u.id
+                     where jr.from_point_break = 0
+                       and u.name not in ('Test', 'Demo Client')
+                     group by 1, 2) main_qry
+                     left join (
+                SELECT PROJECT_ID,
+                       sum(case when RowNo = 1 then days_to_offer else null end) as DAYS_OFFER1,
+                       sum(case when RowNo = 2 then days_to_offer else null end) as DAYS_OFFER2,
+                       sum(case when RowNo = 3 then days_to_offer else null end) as DAYS_OFFER3
+                from (SELECT PROJECT_ID,
+                             days_to_offer,
+                             (SELECT count(distinct jro.job_request_application_id)
+                              from job_request_offer jro
+                                       left join job_request_application jra2
+                                       on jro.job_request_application_id = jra2.id
+                              where jra2.job_request_id = PROJECT_ID
+                                and jro.first_presented_date is not null
+                                and jro.first_presented_date <= InitialChangeDate
+                             ) as RowNo
+                      from (
+                               SELECT jr.id                    as PROJECT_ID,
+                                      5 * (
+                                      DATEDIFF(jro.first_presented_date, jr.creation_date) DIV 7) +
+                                      MID('0123444401233334012222340111123400001234000123440',
+                                          7 * WEEKDAY(jr.creation_date)
+                                          + WEEKDAY(jro.first_presented_date) + 1,
+                                          1)                   as days_to_offer,
+                                      jro.job_request_application_id,
+                                      jro.first_presented_date as InitialChangeDate
+                               from presentation pr
+                                        left join presentation_job_request_offer pjro
+                                        on pr.id = pjro.presentation_id
+                                        left join job_request_offer jro
+                                        on pjro.job_request_offer_id = jro.id
+                                        left join job_request jr on pr.job_request_id = jr.id
+                               where jro.first_presented_date is not null) days_sqry) days_final_qry
+                group by PROJECT_ID) subdays
+                               on subdays.PROJECT_ID = main_qry.PROJECT_ID
+
+                    """]
 
 # class
 class Jaal:
     """The main visualization class
     """
-    def __init__(self, edge_df, node_df=None):
+    def __init__(self, edge_df, node_df=None, title_template=None, session_store=None, node_layout='layered',
+                 sql_workers=1):
         """
         Parameters
         -------------
@@ -28,36 +122,259 @@ class Jaal:
 
         node_df: pandas dataframe (optional)
             The network node data stored in format of pandas dataframe
+
+        title_template: list of (prefix, column) (optional)
+            The node columns shown in the hover title of uploaded nodes
+            (default: jaal.datasets.title.DEFAULT_TITLE_TEMPLATE)
+
+        session_store: SessionStore (optional)
+            where the graph state of every browser session is kept, give one
+            with a backend to run several worker processes
+            (default: SessionStore() in this process)
+
+        node_layout: str or None
+            the layout computing the node positions on the server, 'layered'
+            (lineage from left to right) or 'force', None to let the browser
+            place the nodes (default: 'layered')
+
+        sql_workers: int or None
+            number of processes parsing the uploaded sql scripts, 1 parses them
+            in the callback, None uses one process per cpu (default: 1)
         """
         print("Parsing the data...", end="")
-        self.data, self.scaling_vars = parse_dataframe(edge_df, node_df)
-        self.filtered_data = self.data.copy()
-        self.node_value_color_mapping = {}
-        self.edge_value_color_mapping = {}
+        self.sessions = session_store if session_store is not None else SessionStore()
+        self.title_template = title_template
+        self.node_layout = node_layout
+        self.sql_workers = sql_workers
+        # the sessions showing the same graph set its node positions once
+        self._layout_lock = threading.Lock()
+        # graph key -> the uploaded graphs (GraphState) loaded by this process, see shared_graph
+        self._graphs = LRUCache(maxsize=8)
+        # the graph every new session starts from
+        self.state = self.graph_state(edge_df, node_df, 'default')
+        # parsed uploads, keyed by the hash of their contents
+        self._upload_cache = LRUCache(maxsize=4)
+        self._sql_upload_cache = LRUCache(maxsize=4)
+        # (graph key, 'nodes' or 'edges', column) -> color mapping, see color_mapping
+        self._color_cache = LRUCache(maxsize=64)
+        # (graph key, 'nodes' or 'edges', column, mode) -> sizes, see size_values
+        self._size_cache = LRUCache(maxsize=64)
         print("Done")
 
-    def parse_contents(self, contents, filename, date):
-        content_type, content_string = contents.split(',')
+    @classmethod
+    def from_sql_scripts(cls, scripts, names=None, workers=1, **kwargs):
+        """Create a Jaal showing the table level lineage of sql scripts
 
-        decoded = base64.b64decode(content_string)
+        Parameters
+        -------------
+        scripts: list of str
+            the sql scripts
+
+        names: list of str (optional)
+            the name of every script, used for the scripts writing no table
+
+        workers: int
+            number of worker processes used to parse the scripts (default: 1)
+
+        kwargs:
+            passed to Jaal
+        """
+        edge_df, node_df = build_table_lineage(scripts, names, workers=workers)
+        node_df = add_node_weight(node_df, edge_df)
+        node_df = add_node_title(node_df, kwargs.get('title_template'))
+        return cls(edge_df, node_df, **kwargs)
+
+    @classmethod
+    def from_store(cls, path, **kwargs):
+        """Create a Jaal showing a graph saved as a columnar store (see jaal.store)
+
+        Parameters
+        -------------
+        path: str
+            the directory of the store, e.g. made by jaal.store.csv_to_store
+
+        kwargs:
+            passed to Jaal
+        """
+        edge_df, node_df = load_graph(path)
+        return cls(edge_df, node_df, **kwargs)
+
+    def graph_state(self, edge_df, node_df, graph_key):
+        """Parse the node and edge dataframes and return their graph as a GraphState
+
+        The node positions are set when the graph is first shown, see place_nodes.
+        """
+        state = GraphState(*GraphModel.from_dataframes(edge_df, node_df), graph_key=graph_key)
+        # every process builds the default graph itself (kept as self.state), the uploaded ones are shared
+        if graph_key != 'default':
+            self._graphs.put(graph_key, state)
+            self.sessions.save_graph(graph_key, state)
+        return state
+
+    @property
+    def data(self):
+        """The graph every new session starts from"""
+        return self.state.data
+
+    def session_state(self, session_id):
+        """Return the graph state of a browser session, a fork of self.state for a new one"""
+        return self.sessions.get(session_id, self.state.fork, self.restore_session)
+
+    def shared_graph(self, graph_key):
+        """Return the graph (a GraphState) of a graph key, loaded from the session store if this process has not got it"""
+        if graph_key == 'default':
+            return self.state
+        graph = self._graphs.get(graph_key)
+        if graph is None:
+            graph = self.sessions.load_graph(graph_key)
+            if graph is not None:
+                self._graphs.put(graph_key, graph)
+        return graph
+
+    def restore_session(self, session):
+        """Rebuild the state of a session stored by a SessionStore backend (see GraphState.session)
+
+        Returns None if the graph of the session is not found.
+        """
+        graph = self.shared_graph(session['graph_key'])
+        if graph is None:
+            return None
+        state = graph.fork().restore(session)
+        styles = session['styles']
+        if styles.get('color_nodes', 'None') != 'None':
+            _, state.node_value_color_mapping = self._callback_color_nodes(state, None, styles['color_nodes'])
+        if styles.get('color_edges', 'None') != 'None':
+            _, state.edge_value_color_mapping = self._callback_color_edges(state, None, styles['color_edges'])
+        if styles.get('size_nodes', ('None',))[0] != 'None':
+            self._callback_size_nodes(state, None, *styles['size_nodes'])
+        if styles.get('size_edges', ('None',))[0] != 'None':
+            self._callback_size_edges(state, None, *styles['size_edges'])
+        state.filtered_data = state.pipeline.apply(state.data)
+        return state
+
+    def show_graph(self, session_id, graph):
+        """Make a session show the graph (a GraphState) and return the state of the session"""
+        state = self.session_state(session_id)
+        if state.graph_key != graph.graph_key:
+            new_state = graph.fork()
+            # keep clustering the nodes by the same column
+            new_state.cluster_by = state.cluster_by
+            state = self.sessions.save(session_id, new_state)
+        return state
+
+    def place_nodes(self, state):
+        """Set the node positions of the graph of a session, the first time it is shown
+
+        The positions are set on the node table shared with the other sessions
+        (or on the copy owned by this one), and are computed once per graph.
+        """
+        if self.node_layout is None:
+            return
+        with self._layout_lock:
+            if 'x' not in state.data.tables['nodes'].columns:
+                apply_layout(state.data, state.graph_index, self.node_layout)
 
-        if 'node' in filename:
-            nodenedge_df = pd.read_csv(
-                io.StringIO(decoded.decode('utf-8')))
-        elif 'edge' in filename:
-            nodenedge_df = pd.read_csv(
-                io.StringIO(decoded.decode('utf-8')))
+    def graph_view(self, state, fields=RENDER_FIELDS, hidden=False, max_nodes=1000, max_edges=5000):
+        """Return the graph shown by a session, as sent to the browser
+
+        Parameters
+        -----------
+        state: GraphState
+            the state of the session
+
+        fields: dict
+            the attributes sent to the browser, see render_graph (default: RENDER_FIELDS)
+
+        hidden: boolean
+            keep the nodes and edges filtered out, hidden, as needed by delta
+            updates (default: False)
+
+        max_nodes, max_edges: int
+            maximum number of nodes and edges shown when the nodes are
+            clustered, see cluster_graph (default: 1000 and 5000)
+        """
+        self.place_nodes(state)
+        if state.cluster_by is not None:
+            try:
+                node_mask, edge_mask = state.pipeline.masks(len(state.data['nodes']), len(state.data['edges']))
+                view, state.cluster_ids = cluster_graph(state.data, state.tables, state.graph_index, node_mask, edge_mask,
+                    state.cluster_by, state.expanded, max_nodes=max_nodes, max_edges=max_edges)
+                view = render_graph(view, fields)
+                # a clustered view holds the shown nodes and edges only
+                return with_hidden(view, view, None) if hidden else view
+            except Exception as e:
+                print("wrong cluster column!!", e)
+                state.cluster_by = None
+        state.cluster_ids = {}
+        if hidden:
+            return with_hidden(state.data, state.filtered_data, fields)
+        return render_graph(state.filtered_data, fields)
+
+    def parse_contents(self, contents, filename, date):
+        # stream the csv, without decoding the whole file first
+        nodenedge_df = read_csv_upload(contents)
         return nodenedge_df
 
-    def parse_sql_contents(self, contents, filename, date):
-        content_type, content_string = contents.split(',')
+    def load_graph_upload(self, contents, filenames):
+        """Parse the uploaded node and edge files and return their graph as a GraphState
 
-        decoded = base64.b64decode(content_string)
+        The parsed graph is cached by the hash of the uploaded contents, so the
+        files are decoded and parsed once no matter how many callbacks are
+        triggered by the same upload.
+
+        Parameters
+        -------------
+        contents: list of str
+            the contents of the uploaded files, as given by dcc.Upload
+
+        filenames: list of str
+            the names of the uploaded files, the node file name must contain
+            'node' and the edge file name 'edge' (otherwise edge file first)
+        """
+        def parse():
+            dd = [self.parse_contents(c, n, None) for c, n in zip(contents, filenames)]
+            # pick the files by name, fallback to the upload order
+            edge_df = next((df for n, df in zip(filenames, dd) if 'edge' in n), dd[0])
+            node_df = next((df for n, df in zip(filenames, dd) if 'node' in n and df is not edge_df), None)
+            if node_df is None:
+                # a single file is the edge file, its nodes are the edge ends
+                node_df = dd[1] if len(dd) > 1 else None
+            if node_df is not None:
+                node_df = add_node_weight(node_df, edge_df)
+                node_df = add_node_title(node_df, self.title_template)
+            return self.graph_state(edge_df, node_df, key)
+        key = content_hash(*contents)
+        return self._upload_cache.get_or_compute(key, parse)
 
-        sql_df = pd.read_csv(
-            io.StringIO(decoded.decode('utf-8')))
+    def parse_sql_contents(self, contents, filename, date):
+        sql_df = read_csv_upload(contents, dtype={})
         return sql_df
 
+    def load_sql_lineage_upload(self, contents, filenames):
+        """Build the table level lineage of the uploaded sql scripts and return it as a GraphState
+
+        The graph is cached by the hash of the uploaded contents, like the node
+        and edge uploads.
+        """
+        def parse():
+            edge_df, node_df = build_table_lineage(self.load_sql_upload(contents, filenames), workers=self.sql_workers)
+            node_df = add_node_weight(node_df, edge_df)
+            node_df = add_node_title(node_df, self.title_template)
+            return self.graph_state(edge_df, node_df, key)
+        key = content_hash('sql-lineage', contents[0])
+        return self._upload_cache.get_or_compute(key, parse)
+
+    def load_sql_upload(self, contents, filenames):
+        """Return the sql scripts of the first uploaded file
+
+        The scripts are cached by the hash of the uploaded contents, so the file
+        is decoded and parsed once for all the pages using it.
+        """
+        def parse():
+            sqllist = self.parse_sql_contents(contents[0], filenames[0], None)
+            return sqllist['sqlscripts'].tolist()
+        return self._sql_upload_cache.get_or_compute(content_hash(contents[0]), parse)
+
     def parse_catalog_contents(self, contents, filename, date):
         content_type, content_string = contents.split(',')
 
@@ -97,156 +414,201 @@ class Jaal:
             })
         ])
 
-    def _callback_search_graph(self, graph_data, search_text):
-        """Only show the nodes which match the search text
+    def _callback_search_graph(self, state, graph_data, search_text, direction='both', depth=1):
+        """Only show the nodes which match the search text and the nodes upstream
+        and/or downstream of them, up to `depth` hops
         """
-        nodes = graph_data['nodes']
-        edges = graph_data['edges']
-        nodetest = []
-        nodetest1 = []
-        for node in nodes:
-            # cancel the search
-            if search_text == "":
-                for edge in edges:
-                    node['hidden'] = False
-                    edge['hidden'] = False
-            # do the search
-            else:
-                if search_text != node['label'].lower():
-                    node['hidden'] = True
-                    for edge in edges:
-                        splitededge = edge['id'].split("__")
-                        if((search_text == splitededge[0]) | (search_text == splitededge[1])) & ((node['label'] == splitededge[0]) | (node['label'] == splitededge[1])):
-                            node['hidden'] = False
-                        if((node['label'] == splitededge[0]) | (node['label'] == splitededge[1])):
-                            edge['hidden'] = True
-                            if((search_text == splitededge[0]) | (search_text == splitededge[1])):
-                                edge['hidden'] = False
-                else:
-                    node['hidden'] = False
-        graph_data['nodes'] = nodes
-        return graph_data
-
-    def _callback_filter_nodes(self, graph_data, filter_nodes_text):
-        """Filter the nodes based on the Python query syntax
+        # cancel the search
+        if search_text is None or search_text == "":
+            state.pipeline.remove_stage('search')
+        # do the search, traversing the adjacency index of the graph
+        else:
+            try:
+                depth = int(depth) if depth not in (None, "") else None
+            except ValueError:
+                print("wrong search depth!!")
+                depth = 1
+            direction = direction or 'both'
+            state.pipeline.set_stage('search', (search_text, direction, depth),
+                lambda: state.graph_index.masks(state.graph_index.find_nodes(search_text), direction, depth))
+        state.filtered_data = state.pipeline.apply(state.data)
+        return state.filtered_data
+
+    def _callback_filter_nodes(self, state, graph_data, filter_nodes_text):
+        """Filter the nodes based on the Python query syntax, keeping the search and edge filter
         """
-        self.filtered_data = self.data.copy()
-        node_df = pd.DataFrame(self.filtered_data['nodes'])
         try:
-            node_list = node_df.query(filter_nodes_text)['id'].tolist()
-            nodes = []
-            for node in self.filtered_data['nodes']:
-                if node['id'] in node_list:
-                    nodes.append(node)
-            self.filtered_data['nodes'] = nodes
-            graph_data = self.filtered_data
+            state.pipeline.set_stage('nodes', filter_nodes_text, lambda: (state.tables.mask('nodes', filter_nodes_text), None))
         except:
-            graph_data = self.data
+            state.pipeline.remove_stage('nodes')
             print("wrong node filter query!!")
-        return graph_data
+        state.filtered_data = state.pipeline.apply(state.data)
+        return state.filtered_data
 
-    def _callback_filter_edges(self, graph_data, filter_edges_text):
-        """Filter the edges based on the Python query syntax
+    def _callback_filter_edges(self, state, graph_data, filter_edges_text):
+        """Filter the edges based on the Python query syntax, keeping the search and node filter
         """
-        self.filtered_data = self.data.copy()
-        edges_df = pd.DataFrame(self.filtered_data['edges'])
         try:
-            edges_list = edges_df.query(filter_edges_text)['id'].tolist()
-            edges = []
-            for edge in self.filtered_data['edges']:
-                if edge['id'] in edges_list:
-                    edges.append(edge)
-            self.filtered_data['edges'] = edges
-            graph_data = self.filtered_data
+            state.pipeline.set_stage('edges', filter_edges_text, lambda: (None, state.tables.mask('edges', filter_edges_text)))
         except:
-            graph_data = self.data
+            state.pipeline.remove_stage('edges')
             print("wrong edge filter query!!")
-        return graph_data
+        state.filtered_data = state.pipeline.apply(state.data)
+        return state.filtered_data
+
+    def _refilter(self, state, kind):
+        """Compute the filter of the nodes (or edges) again, after one of their columns changed"""
+        query = state.pipeline.key(kind)
+        if query is not None:
+            state.pipeline.invalidate(kind)
+            filter_callback = self._callback_filter_nodes if kind == 'nodes' else self._callback_filter_edges
+            filter_callback(state, None, query)
+
+    def color_mapping(self, state, kind, column):
+        """Return ({value: color}, color of every node (or edge)) for a categorical column
+
+        The colors only depend on the values of the column, so they are cached
+        per graph (its graph_key) and shared by the sessions showing it.
 
-    def _callback_color_nodes(self, graph_data, color_nodes_value):
+        Parameters
+        -----------
+        state: GraphState
+            the state showing the graph
+
+        kind: str
+            'nodes' or 'edges'
+
+        column: str
+            the column to color by
+        """
+        def compute():
+            codes, values = state.tables.groups(column, kind)
+            colors = get_value_colors(values)
+            return dict(zip(values, colors)), np.asarray(colors, dtype=object)[codes]
+        return self._color_cache.get_or_compute((state.graph_key, kind, column), compute)
+
+    def _callback_color_nodes(self, state, graph_data, color_nodes_value):
+        state.styles['color_nodes'] = color_nodes_value
+        # copy the graph shared with other sessions before changing it
+        state.own_data(['nodes'])
         value_color_mapping = {}
         # color option is None, revert back all changes
         if color_nodes_value == 'None':
             # revert to default color
-            for node in self.data['nodes']:
-                node['color'] = DEFAULT_COLOR
+            colors = [DEFAULT_COLOR] * len(state.data['nodes'])
         else:
             print("inside color node", color_nodes_value)
-            unique_values = pd.DataFrame(self.data['nodes'])[color_nodes_value].unique()
-            colors = get_distinct_colors(len(unique_values))
-            value_color_mapping = {x:y for x, y in zip(unique_values, colors)}
-            for node in self.data['nodes']:
-                node['color'] = value_color_mapping[node[color_nodes_value]]
-        # filter the data currently shown
-        filtered_nodes = [x['id'] for x in self.filtered_data['nodes']]
-        self.filtered_data['nodes'] = [x for x in self.data['nodes'] if x['id'] in filtered_nodes]
-        graph_data = self.filtered_data
+            value_color_mapping, colors = self.color_mapping(state, 'nodes', color_nodes_value)
+        # set the color column of the node table, the other columns are untouched
+        state.tables.set_column('nodes', 'color', colors)
+        # filter the data currently shown, the filter of the nodes may use the column
+        self._refilter(state, 'nodes')
+        state.filtered_data = state.pipeline.apply(state.data)
+        graph_data = state.filtered_data
         return graph_data, value_color_mapping
 
-    def _callback_size_nodes(self, graph_data, size_nodes_value):
+    def size_values(self, state, kind, column, mode='linear'):
+        """Return the size of every node (or width of every edge) scaled from a numerical column
+
+        The sizes are computed from the column at once and always from the
+        default size, so selecting a column again gives the same sizes. They
+        are cached per graph (its graph_key), column and mode.
+
+        Parameters
+        -----------
+        state: GraphState
+            the state showing the graph
+
+        kind: str
+            'nodes' or 'edges'
+
+        column: str
+            the numerical column to size by
+
+        mode: str
+            'linear', 'log' or 'quantile', see scale_values (default: 'linear')
+        """
+        def compute():
+            scaling = state.scaling_vars['node' if kind == 'nodes' else 'edge'][column]
+            scaled = scale_values(state.tables.tables[kind][column].to_numpy(dtype=float, na_value=np.nan),
+                                  scaling['min'], scaling['max'], mode)
+            # nodes grow from their default size, edges are as wide as the scaled value
+            return scaled + DEFAULT_NODE_SIZE if kind == 'nodes' else scaled
+        return self._size_cache.get_or_compute((state.graph_key, kind, column, mode), compute)
+
+    def _callback_size_nodes(self, state, graph_data, size_nodes_value, size_scale='linear'):
+        state.styles['size_nodes'] = (size_nodes_value, size_scale)
+        # copy the graph shared with other sessions before changing it
+        state.own_data(['nodes'])
         # color option is None, revert back all changes
         if size_nodes_value == 'None':
             # revert to default color
-            for node in self.data['nodes']:
-                node['size'] = DEFAULT_NODE_SIZE
+            sizes = [DEFAULT_NODE_SIZE] * len(state.data['nodes'])
         else:
             print("Modifying node size using ", size_nodes_value)
-            # fetch the scaling value
-            minn = self.scaling_vars['node'][size_nodes_value]['min']
-            maxx = self.scaling_vars['node'][size_nodes_value]['max']
-            # define the scaling function
-            scale_val = lambda x: 20*(x-minn)/(maxx-minn)
-            # set size after scaling
-            for node in self.data['nodes']:
-                node['size'] = node['size'] + scale_val(node[size_nodes_value])
-        # filter the data currently shown
-        filtered_nodes = [x['id'] for x in self.filtered_data['nodes']]
-        self.filtered_data['nodes'] = [x for x in self.data['nodes'] if x['id'] in filtered_nodes]
-        graph_data = self.filtered_data
+            sizes = self.size_values(state, 'nodes', size_nodes_value, size_scale)
+        # set all the sizes in one pass
+        state.tables.set_column('nodes', 'size', sizes)
+        # filter the data currently shown, the filter of the nodes may use the column
+        self._refilter(state, 'nodes')
+        state.filtered_data = state.pipeline.apply(state.data)
+        graph_data = state.filtered_data
         return graph_data
 
-    def _callback_color_edges(self, graph_data, color_edges_value):
+    def _callback_color_edges(self, state, graph_data, color_edges_value):
+        state.styles['color_edges'] = color_edges_value
+        # copy the graph shared with other sessions before changing it
+        state.own_data(['edges'])
         value_color_mapping = {}
         # color option is None, revert back all changes
         if color_edges_value == 'None':
             # revert to default color
-            for edge in self.data['edges']:
-                edge['color']['color'] = DEFAULT_COLOR
+            colors = [DEFAULT_COLOR] * len(state.data['edges'])
         else:
             print("inside color edge", color_edges_value)
-            unique_values = pd.DataFrame(self.data['edges'])[color_edges_value].unique()
-            colors = get_distinct_colors(len(unique_values))
-            value_color_mapping = {x:y for x, y in zip(unique_values, colors)}
-            for edge in self.data['edges']:
-                edge['color']['color'] = value_color_mapping[edge[color_edges_value]]
-        # filter the data currently shown
-        filtered_edges = [x['id'] for x in self.filtered_data['edges']]
-        self.filtered_data['edges'] = [x for x in self.data['edges'] if x['id'] in filtered_edges]
-        graph_data = self.filtered_data
+            value_color_mapping, colors = self.color_mapping(state, 'edges', color_edges_value)
+        # set the color column of the edge table, sent as {'color': ...}
+        state.tables.set_column('edges', 'color', colors)
+        # filter the data currently shown, the filter of the edges may use the column
+        self._refilter(state, 'edges')
+        state.filtered_data = state.pipeline.apply(state.data)
+        graph_data = state.filtered_data
         return graph_data, value_color_mapping
 
-    def _callback_size_edges(self, graph_data, size_edges_value):
+    def _callback_size_edges(self, state, graph_data, size_edges_value, size_scale='linear'):
+        state.styles['size_edges'] = (size_edges_value, size_scale)
+        # copy the graph shared with other sessions before changing it
+        state.own_data(['edges'])
         # color option is None, revert back all changes
         if size_edges_value == 'None':
             # revert to default color
-            for edge in self.data['edges']:
-                edge['width'] = DEFAULT_EDGE_SIZE
+            widths = [DEFAULT_EDGE_SIZE] * len(state.data['edges'])
         else:
             print("Modifying edge size using ", size_edges_value)
-            # fetch the scaling value
-            minn = self.scaling_vars['edge'][size_edges_value]['min']
-            maxx = self.scaling_vars['edge'][size_edges_value]['max']
-            # define the scaling function
-            scale_val = lambda x: 20*(x-minn)/(maxx-minn)
-            # set the size after scaling
-            for edge in self.data['edges']:
-                edge['width'] = scale_val(edge[size_edges_value])
-        # filter the data currently shown
-        filtered_edges = [x['id'] for x in self.filtered_data['edges']]
-        self.filtered_data['edges'] = [x for x in self.data['edges'] if x['id'] in filtered_edges]
-        graph_data = self.filtered_data
+            widths = self.size_values(state, 'edges', size_edges_value, size_scale)
+        # set all the widths in one pass
+        state.tables.set_column('edges', 'width', widths)
+        # filter the data currently shown, the filter of the edges may use the column
+        self._refilter(state, 'edges')
+        state.filtered_data = state.pipeline.apply(state.data)
+        graph_data = state.filtered_data
         return graph_data
 
+    def _callback_cluster_nodes(self, state, cluster_nodes_value):
+        """Cluster the nodes by a node column, with all the clusters collapsed
+        """
+        state.cluster_by = None if cluster_nodes_value in (None, 'None') else cluster_nodes_value
+        state.expanded = set()
+
+    def _callback_expand_cluster(self, state, selection):
+        """Expand the selected cluster nodes, return True if one was expanded
+        """
+        selected = (selection or {}).get('nodes', [])
+        values = [state.cluster_ids[node_id] for node_id in selected if state.cluster_ids.get(node_id) is not None]
+        values = [value for value in values if value not in state.expanded]
+        state.expanded.update(values)
+        return len(values) > 0
+
     def get_color_popover_legend_children(self, node_value_color_mapping={}, edge_value_color_mapping={}):
         """Get the popover legends for node and edge based on the color setting
         """
@@ -276,7 +638,8 @@ class Jaal:
         #
         return popover_legend_children
 
-    def create(self, directed=False, vis_opts=None):
+    def create(self, directed=False, vis_opts=None, delta_updates=False, payload='render', cluster_by=None,
+               max_nodes=1000, max_edges=5000):
         """Create the Jaal app and return it
 
         Parameter
@@ -287,56 +650,77 @@ class Jaal:
             vis_opts: dict
                 the visual options to be passed to the dash server (default: None)
 
+            delta_updates: boolean
+                send only the changed nodes and edges to the browser after a
+                search, filter, color or size change instead of the whole graph.
+                The server then keeps a copy of what every session was sent. (default: False)
+
+            payload: str
+                the node and edge attributes sent to the browser, 'render' for
+                the ones drawn by the network (id, label, title, color, size...)
+                or 'full' for all the columns of the data. The columns used to
+                filter, color and size stay on the server either way. (default: 'render')
+
+            cluster_by: str (optional)
+                the node column (e.g. 'schema_name' or 'type_desc') the nodes
+                of a new session are clustered by, for very large graphs (default: None)
+
+            max_nodes, max_edges: int
+                maximum number of nodes and edges shown when the nodes are
+                clustered (default: 1000 and 5000)
+
         Returns
         -------
             app: dash.Dash
                 the Jaal app
         """
+        fields = payload_fields(payload)
+        # the nodes placed on the server need no layout in the browser
+        if self.node_layout is not None:
+            vis_opts = {'layout': {'improvedLayout': False}, **(vis_opts or {})}
+        # new sessions start from the clustered graph
+        self.state.cluster_by = cluster_by
+        view = lambda state, hidden: self.graph_view(state, fields, hidden, max_nodes, max_edges)
         # create the app
         app = dash.Dash(external_stylesheets=[dbc.themes.BOOTSTRAP, 'https://cdnjs.cloudflare.com/ajax/libs/vis/4.20.1/vis.min.css'])
 
-        # define layout
-        app.layout = get_app_layout(self.data, color_legends=self.get_color_popover_legend_children(), directed=directed, vis_opts=vis_opts)
+        # define layout, with a new session id for every visit
+        layout = get_app_layout(self.data, color_legends=self.get_color_popover_legend_children(), directed=directed, vis_opts=vis_opts,
+                                cluster_by=cluster_by)
+        app.layout = lambda: html.Div([dcc.Store(id='session-id', data=str(uuid.uuid4()), storage_type='session'), layout])
 
         # create callbacks to print the data flow map
         @app.callback(
             Output("data-flow-map", "children"),
             [Input("url", "pathname"),
-            Input("upload-data", "contents")],
+            Input("upload-data", "contents"),
+            Input("upload-sql-data", "contents")],
             [State('upload-data', 'filename'),
-            State('upload-data', 'last_modified')]
+            State('upload-data', 'last_modified'),
+            State('upload-sql-data', 'filename'),
+            State('session-id', 'data')]
         )
-        def data_flow_map(pathname, contents, filename, last_modified):
+        def data_flow_map(pathname, contents, sql_contents, filename, last_modified, sql_filename, session_id):
             if pathname == "/":
                 # define layout for the home page
                 if contents is not None:
-                    dd = [
-                        self.parse_contents(c, n, d) for c, n, d in
-                        zip(contents, filename, last_modified)
-                    ]
-                    node_df = dd[1]
-                    edge_df = dd[0]
-                    title = [None]*node_df.shape[0];
-                    weight = [None]*node_df.shape[0];
-                    for index, i in enumerate(weight):
-                        weight[index] = 0;
-                        for j in edge_df.itertuples():
-                            if (node_df['id'][index] == getattr(j, '_3')) | (node_df['id'][index] == getattr(j, 'to')):
-                                weight[index] += 1;
-                    node_df['weight'] = weight;
-
-                    for index, i in enumerate(title):
-                        title[index] = 'Name:' + node_df['id'][index] + '<br>Number of edges:' + str(node_df['weight'][index]) + '<br>Type:' + node_df['type_desc'][index] + '<br>Create date: ' + str(node_df['create_date'][index]) + '<br>Modify date: ' + str(node_df['modify_date'][index])
-
-                    node_df['title'] = title
-                    data2, self.scaling_vars = parse_dataframe(edge_df, node_df)
-                    # graph_data = data2
-                    self.data = data2
+                    state = self.show_graph(session_id, self.load_graph_upload(contents, filename))
+                # without node and edge files, show the lineage of the sql scripts
+                elif sql_contents is not None:
+                    state = self.show_graph(session_id, self.load_sql_lineage_upload(sql_contents, sql_filename))
+                else:
+                    state = self.session_state(session_id)
+                with state.lock:
+                    graph_data = view(state, delta_updates)
+                    # the new network holds the whole graph, with what is filtered out hidden
+                    if delta_updates:
+                        state.sent = snapshot(graph_data)
+                    self.sessions.save(session_id, state)
                 return [
                     html.Div(
                         visdcc.Network(
                             id = 'graph',
-                            data = self.data,
+                            data = graph_data,
                             options = get_options(directed,vis_opts))
                     )
                 ]
@@ -350,113 +734,16 @@ class Jaal:
             State('upload-sql-data', 'last_modified')]
         )
         def render_page_content(pathname, contents, filename, last_modified):
-            sqlquery = ["""
-                   SELECT main_qry.*,
-                   subdays.DAYS_OFFER1,
-                   subdays.DAYS_OFFER2,
-                   subdays.DAYS_OFFER3
-            from (
-                     SELECT jr.id  as PROJECT_ID,
-                            5 * (DATEDIFF(ifnull(lc.creation_date, now()), jr.creation_date) DIV 7)
-                                + MID('0123444401233334012222340111123400001234000123440',
-                                      7 * WEEKDAY(jr.creation_date)
-                                      + WEEKDAY(ifnull(lc.creation_date, now())) + 1, 1)
-                                      as LIFETIME,
-                            count(distinct
-                                  case when jra.application_source = 'VERAMA'
-                                    then jra.id else null end)        NUM_APPLICATIONS,
-                            count(distinct jra.id) NUM_CANDIDATES,
-                            sum(case when jro.stage = 'DEAL' then 1 else 0 end) as NUM_CONTRACTED,
-                            sum(ifnull(IS_INTERVIEW, 0)) as NUM_INTERVIEWED,
-                            sum(ifnull(IS_PRESENTATION, 0)) as NUM_OFFERED
-                     from job_request jr
-                              left join job_request_application jra on jr.id = jra.job_request_id
-                              left join job_request_offer jro
-                              on jro.job_request_application_id = jra.id
-                              left join lifecycle lc on lc.object_id=jr.id
-                              and lc.lifecycle_object_type='JOB_REQUEST'
-                              and lc.event = 'JOB_REQUEST_CLOSED'
-                              left join (SELECT jro2.job_request_application_id,
-                                                max(case
-                                                        when jro2.first_interview_scheduled_date
-                                                        is not null then 1
-                                                        else 0 end) as IS_INTERVIEW,
-                                                max(case when jro2.first_presented_date is not null
-                                                then 1 else 0 end) as IS_PRESENTATION
-                                         from job_request_offer jro2
-                                         group by 1) jrah2
-                                         on jra.id = jrah2.job_request_application_id
-                              left join client u on jr.client_id = u.id
-                     where jr.from_point_break = 0
-                       and u.name not in ('Test', 'Demo Client')
-                     group by 1, 2) main_qry
-                     left join (
-                SELECT PROJECT_ID,
-                       sum(case when RowNo = 1 then days_to_offer else null end) as DAYS_OFFER1,
-                       sum(case when RowNo = 2 then days_to_offer else null end) as DAYS_OFFER2,
-                       sum(case when RowNo = 3 then days_to_offer else null end) as DAYS_OFFER3
-                from (SELECT PROJECT_ID,
-                             days_to_offer,
-                             (SELECT count(distinct jro.job_request_application_id)
-                              from job_request_offer jro
-                                       left join job_request_application jra2
-                                       on jro.job_request_application_id = jra2.id
-                              where jra2.job_request_id = PROJECT_ID
-                                and jro.first_presented_date is not null
-                                and jro.first_presented_date <= InitialChangeDate
-                             ) as RowNo
-                      from (
-                               SELECT jr.id                    as PROJECT_ID,
-                                      5 * (
-                                      DATEDIFF(jro.first_presented_date, jr.creation_date) DIV 7) +
-                                      MID('0123444401233334012222340111123400001234000123440',
-                                          7 * WEEKDAY(jr.creation_date)
-                                          + WEEKDAY(jro.first_presented_date) + 1,
-                                          1)                   as days_to_offer,
-                                      jro.job_request_application_id,
-                                      jro.first_presented_date as InitialChangeDate
-                               from presentation pr
-                                        left join presentation_job_request_offer pjro
-                                        on pr.id = pjro.presentation_id
-                                        left join job_request_offer jro
-                                        on pjro.job_request_offer_id = jro.id
-                                        left join job_request jr on pr.job_request_id = jr.id
-                               where jro.first_presented_date is not null) days_sqry) days_final_qry
-                group by PROJECT_ID) subdays
-                               on subdays.PROJECT_ID = main_qry.PROJECT_ID
-
-                    """]
-            
-            ctx = dash.callback_context
-            if ctx.triggered:
-                input_id = ctx.triggered[0]['prop_id'].split('.')[0]
-                if input_id == 'upload-sql-data':
-                    dd = [
-                        self.parse_sql_contents(c, n, d) for c, n, d in
-                        zip(contents, filename, last_modified)
-                    ]
-                    sqllist = dd[0]
-                    sqlquery = sqllist['sqlscripts'][0]
-
-            # call the function from the file lineage.py at the back-end
-            sub_and_ca = []
+            # nothing to render outside of the page
+            if pathname != "/page-1":
+                return None
+            sqlquery = DEFAULT_SQL_SCRIPTS
             if contents is not None:
-                dd = [
-                        self.parse_sql_contents(c, n, d) for c, n, d in
-                        zip(contents, filename, last_modified)
-                    ]
-                sqllist = dd[0]
-                # sqlquery = sqllist['sqlscripts'][0]
-                sqlquery = sqllist['sqlscripts']
-                # sub_and_ca = parse_subquery_and_case(sqlquery)
-                sub_and_ca = parse_subquery_and_case2(sqlquery)
-            else:
-                # sub_and_ca = parse_subquery_and_case(sqlquery)
-                sub_and_ca = parse_subquery_and_case2(sqlquery)
-
-            if pathname == "/page-1":
-                # case statement list
-                return create_case_show2(sub_and_ca[0])
+                sqlquery = self.load_sql_upload(contents, filename)
+            # call the function from the file lineage.py at the back-end
+            sub_and_ca = parse_subquery_and_case2(sqlquery, workers=self.sql_workers)
+            # subquery list
+            return create_case_show2(sub_and_ca[0])
 
         @app.callback(
             Output("page_for_case", "children"),
@@ -466,110 +753,16 @@ class Jaal:
             State('upload-sql-data', 'last_modified')]
         )
         def render_page_content(pathname, contents, filename, last_modified):
-            sqlquery = ["""
-                   SELECT main_qry.*,
-                   subdays.DAYS_OFFER1,
-                   subdays.DAYS_OFFER2,
-                   subdays.DAYS_OFFER3
-            from (
-                     SELECT jr.id  as PROJECT_ID,
-                            5 * (DATEDIFF(ifnull(lc.creation_date, now()), jr.creation_date) DIV 7)
-                                + MID('0123444401233334012222340111123400001234000123440',
-                                      7 * WEEKDAY(jr.creation_date)
-                                      + WEEKDAY(ifnull(lc.creation_date, now())) + 1, 1)
-                                      as LIFETIME,
-                            count(distinct
-                                  case when jra.application_source = 'VERAMA'
-                                    then jra.id else null end)        NUM_APPLICATIONS,
-                            count(distinct jra.id) NUM_CANDIDATES,
-                            sum(case when jro.stage = 'DEAL' then 1 else 0 end) as NUM_CONTRACTED,
-                            sum(ifnull(IS_INTERVIEW, 0)) as NUM_INTERVIEWED,
-                            sum(ifnull(IS_PRESENTATION, 0)) as NUM_OFFERED
-                     from job_request jr
-                              left join job_request_application jra on jr.id = jra.job_request_id
-                              left join job_request_offer jro
-                              on jro.job_request_application_id = jra.id
-                              left join lifecycle lc on lc.object_id=jr.id
-                              and lc.lifecycle_object_type='JOB_REQUEST'
-                              and lc.event = 'JOB_REQUEST_CLOSED'
-                              left join (SELECT jro2.job_request_application_id,
-                                                max(case
-                                                        when jro2.first_interview_scheduled_date
-                                                        is not null then 1
-                                                        else 0 end) as IS_INTERVIEW,
-                                                max(case when jro2.first_presented_date is not null
-                                                then 1 else 0 end) as IS_PRESENTATION
-                                         from job_request_offer jro2
-                                         group by 1) jrah2
-                                         on jra.id = jrah2.job_request_application_id
-                              left join client u on jr.client_id = u.id
-                     where jr.from_point_break = 0
-                       and u.name not in ('Test', 'Demo Client')
-                     group by 1, 2) main_qry
-                     left join (
-                SELECT PROJECT_ID,
-                       sum(case when RowNo = 1 then days_to_offer else null end) as DAYS_OFFER1,
-                       sum(case when RowNo = 2 then days_to_offer else null end) as DAYS_OFFER2,
-                       sum(case when RowNo = 3 then days_to_offer else null end) as DAYS_OFFER3
-                from (SELECT PROJECT_ID,
-                             days_to_offer,
-                             (SELECT count(distinct jro.job_request_application_id)
-                              from job_request_offer jro
-                                       left join job_request_application jra2
-                                       on jro.job_request_application_id = jra2.id
-                              where jra2.job_request_id = PROJECT_ID
-                                and jro.first_presented_date is not null
-                                and jro.first_presented_date <= InitialChangeDate
-                             ) as RowNo
-                      from (
-                               SELECT jr.id                    as PROJECT_ID,
-                                      5 * (
-                                      DATEDIFF(jro.first_presented_date, jr.creation_date) DIV 7) +
-                                      MID('0123444401233334012222340111123400001234000123440',
-                                          7 * WEEKDAY(jr.creation_date)
-                                          + WEEKDAY(jro.first_presented_date) + 1,
-                                          1)                   as days_to_offer,
-                                      jro.job_request_application_id,
-                                      jro.first_presented_date as InitialChangeDate
-                               from presentation pr
-                                        left join presentation_job_request_offer pjro
-                                        on pr.id = pjro.presentation_id
-                                        left join job_request_offer jro
-                                        on pjro.job_request_offer_id = jro.id
-                                        left join job_request jr on pr.job_request_id = jr.id
-                               where jro.first_presented_date is not null) days_sqry) days_final_qry
-                group by PROJECT_ID) subdays
-                               on subdays.PROJECT_ID = main_qry.PROJECT_ID
-
-                    """]
-            
-            ctx = dash.callback_context
-            if ctx.triggered:
-                input_id = ctx.triggered[0]['prop_id'].split('.')[0]
-                if input_id == 'upload-sql-data':
-                    dd = [
-                        self.parse_sql_contents(c, n, d) for c, n, d in
-                        zip(contents, filename, last_modified)
-                    ]
-                    sqllist = dd[0]
-                    sqlquery = sqllist['sqlscripts'][0]
-
-            # call the function from the file lineage.py at the back-end
-            sub_and_ca = []
+            # nothing to render outside of the page
+            if pathname != "/page-2":
+                return None
+            sqlquery = DEFAULT_SQL_SCRIPTS
             if contents is not None:
-                dd = [
-                        self.parse_sql_contents(c, n, d) for c, n, d in
-                        zip(contents, filename, last_modified)
-                    ]
-                sqllist = dd[0]
-                sqlquery = sqllist['sqlscripts']
-                sub_and_ca = parse_subquery_and_case2(sqlquery)
-            else:
-                sub_and_ca = parse_subquery_and_case2(sqlquery)
-
-            if pathname == "/page-2":
-                # define layout for the page-2 page
-                return create_case_show2(sub_and_ca[1])
+                sqlquery = self.load_sql_upload(contents, filename)
+            # call the function from the file lineage.py at the back-end
+            sub_and_ca = parse_subquery_and_case2(sqlquery, workers=self.sql_workers)
+            # case statement list
+            return create_case_show2(sub_and_ca[1])
 
         @app.callback(
             Output("page_for_catalog", "children"),
@@ -630,84 +823,101 @@ class Jaal:
                 return not is_open
             return is_open
 
+        # suggest node labels while typing in the search box
+        @app.callback(
+            Output('search_suggestions', 'children'),
+            [Input('search_graph', 'value')],
+            [State('session-id', 'data')]
+        )
+        def search_suggestions_callback(search_text, session_id):
+            label_index = self.session_state(session_id).label_index
+            return [html.Option(value=label) for label in label_index.suggest(search_text)]
+
         # create the main callbacks
         @app.callback(
-            [Output('graph', 'data'), Output('color-legend-popup', 'children')],
+            [Output('graph', 'run' if delta_updates else 'data'), Output('color-legend-popup', 'children')],
             [Input('search_graph', 'value'),
+            Input('search_direction', 'value'),
+            Input('search_depth', 'value'),
             Input('filter_nodes', 'value'),
             Input('filter_edges', 'value'),
             Input('color_nodes', 'value'),
             Input('color_edges', 'value'),
             Input('size_nodes', 'value'),
             Input('size_edges', 'value'),
+            Input('size_scale', 'value'),
+            Input('cluster_nodes', 'value'),
+            Input('collapse_clusters', 'n_clicks'),
+            Input('graph', 'selection'),
             Input('upload-data', 'contents')],
             [State('upload-data', 'filename'),
             State('upload-data', 'last_modified'),
-            State('graph', 'data')]
+            State('graph', 'data'),
+            State('session-id', 'data')]
         )
-        def setting_pane_callback(search_text, filter_nodes_text, filter_edges_text,
-                    color_nodes_value, color_edges_value, size_nodes_value, size_edges_value, list_of_contents, list_of_names, list_of_dates, graph_data):
+        def setting_pane_callback(search_text, search_direction, search_depth, filter_nodes_text, filter_edges_text,
+                    color_nodes_value, color_edges_value, size_nodes_value, size_edges_value, size_scale, cluster_nodes_value,
+                    collapse_clicks, selection, list_of_contents, list_of_names, list_of_dates, graph_data, session_id):
             # fetch the id of option which triggered
             ctx = dash.callback_context
+            # the graph of this browser session
+            state = self.session_state(session_id)
             # if its the first call
             if not ctx.triggered:
                 print("No trigger")
-                return [self.data, self.get_color_popover_legend_children()]
-            else:
-                # find the id of the option which was triggered
-                input_id = ctx.triggered[0]['prop_id'].split('.')[0]
+                with state.lock:
+                    graph_data = "" if delta_updates else view(state, False)
+                return [graph_data, self.get_color_popover_legend_children()]
+            # find the id of the option which was triggered
+            input_id = ctx.triggered[0]['prop_id'].split('.')[0]
+            # a new upload replaces the graph of the session
+            if input_id == 'upload-data' and list_of_contents is not None:
+                state = self.show_graph(session_id, self.load_graph_upload(list_of_contents, list_of_names))
+            # one callback at a time changes the state of a session
+            with state.lock:
+                # selecting a node changes the graph only if it expands a cluster
+                if input_id == 'graph' and not self._callback_expand_cluster(state, selection):
+                    return [dash.no_update, dash.no_update]
+                if input_id == 'cluster_nodes':
+                    self._callback_cluster_nodes(state, cluster_nodes_value)
+                if input_id == 'collapse_clusters':
+                    state.expanded = set()
                 # perform operation in case of search graph option
-                if input_id == "search_graph":
-                    graph_data = self._callback_search_graph(graph_data, search_text)
+                if input_id in ("search_graph", "search_direction", "search_depth"):
+                    self._callback_search_graph(state, graph_data, search_text, search_direction, search_depth)
                 # In case filter nodes was triggered
                 elif input_id == 'filter_nodes':
-                    graph_data = self._callback_filter_nodes(graph_data, filter_nodes_text)
+                    self._callback_filter_nodes(state, graph_data, filter_nodes_text)
                 # In case filter edges was triggered
                 elif input_id == 'filter_edges':
-                    graph_data = self._callback_filter_edges(graph_data, filter_edges_text)
+                    self._callback_filter_edges(state, graph_data, filter_edges_text)
                 # If color node text is provided
                 if input_id == 'color_nodes':
-                    graph_data, self.node_value_color_mapping = self._callback_color_nodes(graph_data, color_nodes_value)
+                    _, state.node_value_color_mapping = self._callback_color_nodes(state, graph_data, color_nodes_value)
                 # If color edge text is provided
                 if input_id == 'color_edges':
-                    graph_data, self.edge_value_color_mapping = self._callback_color_edges(graph_data, color_edges_value)
+                    _, state.edge_value_color_mapping = self._callback_color_edges(state, graph_data, color_edges_value)
                 # If size node text is provided
-                if input_id == 'size_nodes':
-                    graph_data = self._callback_size_nodes(graph_data, size_nodes_value)
+                if input_id == 'size_nodes' or (input_id == 'size_scale' and size_nodes_value not in (None, 'None')):
+                    self._callback_size_nodes(state, graph_data, size_nodes_value, size_scale or 'linear')
                 # If size edge text is provided
-                if input_id == 'size_edges':
-                    graph_data = self._callback_size_edges(graph_data, size_edges_value)
-                if input_id == 'upload-data':
-                    if list_of_contents is not None:
-                        dd = [
-                            self.parse_contents(c, n, d) for c, n, d in
-                            zip(list_of_contents, list_of_names, list_of_dates)
-                        ]
-                        node_df = dd[1]
-                        edge_df = dd[0]
-                        title = [None]*node_df.shape[0];
-                        weight = [None]*node_df.shape[0];
-                        for index, i in enumerate(weight):
-                            weight[index] = 0;
-                            for j in edge_df.itertuples():
-                                if (node_df['id'][index] == getattr(j, '_3')) | (node_df['id'][index] == getattr(j, 'to')):
-                                    weight[index] += 1;
-                        node_df['weight'] = weight;
-
-                        for index, i in enumerate(title):
-                            title[index] = 'Name:' + node_df['id'][index] + '<br>Number of edges:' + str(node_df['weight'][index]) + '<br>Type:' + node_df['type_desc'][index] + '<br>Create date: ' + str(node_df['create_date'][index]) + '<br>Modify date: ' + str(node_df['modify_date'][index])
-
-                        node_df['title'] = title
-                        data2, self.scaling_vars = parse_dataframe(edge_df, node_df)
-                        graph_data = data2
+                if input_id == 'size_edges' or (input_id == 'size_scale' and size_edges_value not in (None, 'None')):
+                    self._callback_size_edges(state, graph_data, size_edges_value, size_scale or 'linear')
+                # the graph shown by the session, only what changed since the last update
+                graph_data = view(state, delta_updates)
+                if delta_updates:
+                    graph_data, state.sent = graph_patch(state.sent, graph_data)
+                # keep the changes for the next callbacks of the session
+                self.sessions.save(session_id, state)
             # create the color legend childrens
-            color_popover_legend_children = self.get_color_popover_legend_children(self.node_value_color_mapping, self.edge_value_color_mapping)
+            color_popover_legend_children = self.get_color_popover_legend_children(state.node_value_color_mapping, state.edge_value_color_mapping)
             # finally return the modified data
             return [graph_data, color_popover_legend_children]
         # return server
         return app
 
-    def plot(self, debug=False, host="127.0.0.1", port="8050", directed=False, vis_opts=None):
+    def plot(self, debug=False, host="127.0.0.1", port="8050", directed=False, vis_opts=None, delta_updates=False,
+             payload='render', cluster_by=None, max_nodes=1000, max_edges=5000):
         """Plot the Jaal by first creating the app and then hosting it on default server
 
         Parameter
@@ -726,8 +936,21 @@ class Jaal:
 
             vis_opts: dict
                 the visual options to be passed to the dash server (default: None)
+
+            delta_updates: boolean
+                send only the changes of the graph to the browser, see create (default: False)
+
+            payload: str
+                the node and edge attributes sent to the browser, see create (default: 'render')
+
+            cluster_by: str (optional)
+                the node column the nodes of a new session are clustered by, see create (default: None)
+
+            max_nodes, max_edges: int
+                maximum number of nodes and edges shown when the nodes are clustered (default: 1000 and 5000)
         """
         # call the create_graph function
-        app = self.create(directed=directed, vis_opts=vis_opts)
+        app = self.create(directed=directed, vis_opts=vis_opts, delta_updates=delta_updates, payload=payload,
+                          cluster_by=cluster_by, max_nodes=max_nodes, max_edges=max_edges)
         # run the server
         app.run_server(debug=False, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Prefix and fuzzy (trigram) search over the node labels
+
+The labels are kept sorted, so the labels starting with a prefix are found by
+bisection, and every label is listed under its trigrams, so labels sharing
+most trigrams with a misspelled text are found by counting. Neither lookup
+scans all the labels.
+"""
+
+# imports
+from bisect import bisect_left
+import numpy as np
+
+def trigrams(text):
+    """Return the set of trigrams of a text, padded like in postgres pg_trgm"""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LabelIndex:
+    """Sorted and trigram index of node labels
+    """
+    def __init__(self, labels, max_candidates=20000):
+        """
+        Parameters
+        -------------
+        labels: list of str
+            the labels to index, matched case insensitively
+
+        max_candidates: int
+            maximum number of labels scored by a fuzzy lookup, taken from the
+            rarest trigrams of the text (default: 20000)
+        """
+        self.max_candidates = max_candidates
+        # lower case label -> label as first seen
+        self.labels = {}
+        for label in labels:
+            self.labels.setdefault(str(label).lower(), str(label))
+        self.keys = sorted(self.labels)
+        # trigram -> positions of the keys containing it
+        postings = {}
+        self.n_trigrams = np.zeros(len(self.keys), dtype=np.int32)
+        for position, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.n_trigrams[position] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prefix(self, text, limit=10):
+        """Return up to `limit` labels starting with text, in alphabetical order"""
+        text = str(text).lower()
+        matches = []
+        position = bisect_left(self.keys, text)
+        while position < len(self.keys) and len(matches) < limit and self.keys[position].startswith(text):
+            matches.append(self.labels[self.keys[position]])
+            position += 1
+        return matches
+
+    def fuzzy(self, text, limit=10, min_score=0.2):
+        """Return up to `limit` (label, score) ranked by trigram similarity with text
+
+        The score is the number of shared trigrams over the number of distinct
+        trigrams of both (1 for the same label).
+        """
+        grams = trigrams(str(text))
+        lists = sorted((self.postings[gram] for gram in grams if gram in self.postings), key=len)
+        if len(lists) == 0:
+            return []
+        # candidates: the labels of the rarest trigrams, up to max_candidates postings
+        chosen, total = [], 0
+        for positions in lists:
+            if total + len(positions) > self.max_candidates and len(chosen) > 0:
+                break
+            chosen.append(positions)
+            total += len(positions)
+        candidates = np.unique(np.concatenate(chosen))[:self.max_candidates]
+        # count the trigrams shared by every candidate (postings are sorted)
+        shared = np.zeros(len(candidates), dtype=np.int32)
+        for positions in lists:
+            found = np.minimum(np.searchsorted(positions, candidates), len(positions) - 1)
+            shared += positions[found] == candidates
+        scores = shared / (len(grams) + self.n_trigrams[candidates] - shared)
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        best = np.argsort(-scores, kind='stable')[:limit]
+        return [(self.labels[self.keys[candidates[i]]], float(scores[i])) for i in best]
+
+    def suggest(self, text, limit=10):
+        """Return up to `limit` labels for a partially typed text: prefix matches
+        first, completed by the closest fuzzy matches
+        """
+        if text is None or str(text).strip() == "":
+            return []
+        suggestions = self.prefix(text, limit)
+        if len(suggestions) < limit:
+            seen = set(suggestions)
+            for label, _ in self.fuzzy(text, limit):
+                if label not in seen and len(suggestions) < limit:
+                    suggestions.append(label)
+                    seen.add(label)
+        return suggestions
@@ -4,6 +4,8 @@ import os
 from turtle import width
 import visdcc
 import base64
+import colorsys
+import hashlib
 import pandas as pd
 import dash
 from dash import dcc, html
@@ -12,6 +14,7 @@ import dash_html_components as html
 import dash_core_components as dcc
 from dash.dependencies import Input, Output
 import plotly.express as px
+from .datasets.parse_dataframe import SCALING_MODES
 import pandas as pd
 
 # Constants
@@ -22,6 +25,9 @@ DEFAULT_EDGE_SIZE = 1
 # default node and egde color
 DEFAULT_COLOR = '#97C2FC'
 
+# largest number of values of a property to color by
+MAX_COLOR_VALUES = 200
+
 # Taken from https://stackoverflow.com/questions/470690/how-to-automatically-generate-n-distinct-colors
 KELLY_COLORS_HEX = [
     "#FFB300", # Vivid Yellow
@@ -71,16 +77,25 @@ def get_options(directed, opts_args):
         opts.update(opts_args)
     return opts
 
-def get_distinct_colors(n):
-    """Return distict colors, currently atmost 20
+def _hsv_hex(hue, saturation, value):
+    """Return the hex code of an HSV color (components in [0, 1])"""
+    return '#%02X%02X%02X' % tuple(round(c * 255) for c in colorsys.hsv_to_rgb(hue, saturation, value))
+
+def hash_color(value):
+    """Return the color of a value, from the hash of its text: the same value always gets the same color"""
+    digest = hashlib.md5(str(value).encode('utf-8')).digest()
+    return _hsv_hex(digest[0] / 255, 0.45 + 0.55 * digest[1] / 255, 0.6 + 0.35 * digest[2] / 255)
+
+def get_value_colors(values):
+    """Return the color of every value: the Kelly colors for the first 20 values, then hash_color
 
     Parameters
     -----------
-    n: int
-        the distinct colors required
+    values: list
+        the distinct values to color
     """
-    if n <= 20:
-        return KELLY_COLORS_HEX[:n]
+    colors = KELLY_COLORS_HEX[:len(values)]
+    return colors + [hash_color(value) for value in values[len(colors):]]
 
 def create_card(id, value, description):
     """Creates card for high level stats
@@ -113,9 +128,18 @@ def create_row(children, style=fetch_flex_row_style()):
 
 search_form = dbc.FormGroup(
     [
-        dbc.Input(type="search", id="search_graph", placeholder="Search node in graph..."),
+        dbc.Input(type="search", id="search_graph", placeholder="Search node in graph...", list="search_suggestions", autoComplete="off"),
+        html.Datalist(id="search_suggestions"),
+        dbc.InputGroup([
+            dbc.Select(id="search_direction",
+                options=[{'label': "Up & downstream", 'value': 'both'},
+                         {'label': "Upstream", 'value': 'upstream'},
+                         {'label': "Downstream", 'value': 'downstream'}],
+                value='both'),
+            dbc.Input(type="number", id="search_depth", min=1, step=1, value=1, placeholder="all"),
+        ], size="sm"),
         dbc.FormText(
-            "Show the node you are looking for",
+            "Show the node you are looking for and its lineage up to the given depth (empty for all)",
             color="secondary",
         ),
     ]
@@ -145,7 +169,7 @@ filter_edge_form = dbc.FormGroup([
     ),
 ])
 
-def get_select_form_layout(id, options, label, description):
+def get_select_form_layout(id, options, label, description, value=None):
     """Creates a select (dropdown) form with provides details
 
     Parameters
@@ -158,12 +182,15 @@ def get_select_form_layout(id, options, label, description):
         label of the select dropdown bar
     description: str
         long text detail of the setting
+    value: str (optional)
+        the option selected at first
     """
     return  dbc.FormGroup([
                 dbc.InputGroup([
                     dbc.InputGroupAddon(label, addon_type="append"),
                     dbc.Select(id=id,
-                        options=options
+                        options=options,
+                        value=value
                     ),]),
                 dbc.FormText(description, color="secondary",)
             ,])
@@ -172,14 +199,10 @@ def get_categorical_features(df_, unique_limit=20, blacklist_features=['shape',
     """Identify categorical features for edge or node data and return their names
     Additional logics: (1) cardinality should be within `unique_limit`, (2) remove blacklist_features
     """
-    # identify the rel cols + None
-    cat_features = ['None'] + df_.columns[(df_.dtypes == 'object') & (df_.apply(pd.Series.nunique) <= unique_limit)].tolist()
-    # remove irrelevant cols
-    try:
-        for col in blacklist_features:
-            cat_features.remove(col)
-    except:
-        pass
+    # identify the rel cols (text or categorical) + None, counting the values of those only
+    candidates = [col for col in df_.columns if col not in blacklist_features and
+                  (pd.api.types.is_string_dtype(df_[col]) or isinstance(df_[col].dtype, pd.CategoricalDtype))]
+    cat_features = ['None'] + [col for col in candidates if df_[col].nunique() <= unique_limit]
     # return
     return cat_features
 
@@ -191,27 +214,33 @@ def get_numerical_features(df_, unique_limit=20):
     # identify numerical features
     numeric_features = ['None'] + df_.select_dtypes(include=numerics).columns.tolist()
     # remove blacklist cols (for nodes)
-    try:
-        numeric_features.remove('size')
-    except:
-        pass
+    for col in ['size', 'x', 'y']:
+        if col in numeric_features:
+            numeric_features.remove(col)
     # return
     return numeric_features
 
-def get_app_layout(graph_data, color_legends=[], directed=False, vis_opts=None):
+def get_app_layout(graph_data, color_legends=[], directed=False, vis_opts=None, cluster_by=None):
     """Create and return the layout of the app
 
     Parameters
     --------------
-    graph_data: dict{nodes, edges}
-        network data in format of visdcc
+    graph_data: GraphModel
+        network data, its node and edge tables
+
+    cluster_by: str (optional)
+        the node column the nodes are clustered by at first
     """
     # Step 1-2: find categorical features of nodes and edges
-    cat_node_features = get_categorical_features(pd.DataFrame(graph_data['nodes']), 20, ['shape', 'label', 'id'])
-    cat_edge_features = get_categorical_features(pd.DataFrame(graph_data['edges']).drop(columns=['color']), 20, ['color', 'from', 'to', 'id'])
+    # (colors beyond the 20 Kelly colors come from the hash of the values)
+    node_df, edge_df = graph_data.node_table, graph_data.edge_table
+    cat_node_features = get_categorical_features(node_df, MAX_COLOR_VALUES, ['shape', 'label', 'id', 'title', 'color'])
+    cat_edge_features = get_categorical_features(edge_df, MAX_COLOR_VALUES, ['color', 'from', 'to', 'id'])
     # Step 3-4: Get numerical features of nodes and edges
-    num_node_features = get_numerical_features(pd.DataFrame(graph_data['nodes']))
-    num_edge_features = get_numerical_features(pd.DataFrame(graph_data['edges']))
+    num_node_features = get_numerical_features(node_df)
+    num_edge_features = get_numerical_features(edge_df)
+    # the node features to cluster by, with more distinct values than the colors
+    cluster_node_features = get_categorical_features(node_df, 1000, ['shape', 'label', 'id', 'title', 'color'])
     # Create new function of selecting nodes
 
     # Step 5: create and return the layout
@@ -380,7 +409,26 @@ def get_app_layout(graph_data, color_legends=[], directed=False, vis_opts=None):
                                 label='Size edges by',
                                 description='Select the numerical edge property to size edges by'
                             ),
+                            get_select_form_layout(
+                                id='size_scale',
+                                options=[{'label': opt, 'value': opt} for opt in SCALING_MODES],
+                                label='Scale sizes',
+                                description='Linear, logarithmic (for skewed properties) or by quantile',
+                                value='linear'
+                            ),
                         ], id="size-show-toggle", is_open=True),
+
+                        # ---- cluster section ----
+                            html.H6("Cluster"), # heading
+                            dbc.Button("Collapse all", id="collapse_clusters", outline=True, color="secondary", size="sm"),
+                        html.Hr(className="my-2"),
+                        get_select_form_layout(
+                            id='cluster_nodes',
+                            options=[{'label': opt, 'value': opt} for opt in cluster_node_features],
+                            label='Cluster nodes by',
+                            description='Draw the nodes of every value of the node property as one node, click it to expand it',
+                            value=cluster_by
+                        ),
     ],
     
     style=SIDEBAR_STYLE,
@@ -1,6 +1,18 @@
+import os
+import re
 import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
 from sql_metadata import Parser
-import xlwt
+from .cache import LRUCache, content_hash
+from .sql_tokenizer import tokenize_sql, keyword_scanner, unquote
+from .column_lineage import ColumnLineageIndex, extract_column_lineage
+
+# number of parsed scripts kept in memory
+PARSE_CACHE_SIZE = 4096
+# parsed scripts, keyed by the hash of the script text
+parse_cache = LRUCache(maxsize=PARSE_CACHE_SIZE)
 
 sqlquery = """
        SELECT main_qry.*,
@@ -246,69 +258,771 @@ def get_by_key(item, key):
     return value
 
 
+# words starting a new clause, they end the current item of a query level
+CLAUSE_WORDS = {'select', 'from', 'where', 'group', 'order', 'having', 'union', 'intersect', 'except',
+                'into', 'limit', 'set', 'values', 'on', 'join', 'returning', 'window', 'qualify'}
+# words making a parenthesis level a (sub)query
+QUERY_WORDS = {'select', 'with', 'values'}
+# words which can not be followed by an alias
+NO_ALIAS_WORDS = {'and', 'or', 'not', 'is', 'in', 'like', 'between', 'when', 'then', 'else', 'case',
+                  'by', 'distinct', 'select', 'on', 'where', 'having'}
+
+# whitespace and comments
+_BLANK = r"(?:\s|--[^\n]*|/\*.*?(?:\*/|\Z))*"
+_BLANK_RE = re.compile(_BLANK, re.DOTALL)
+# what the case statements are found with: CASE, END and the punctuation
+_CASE_SCANNER = keyword_scanner({'case', 'end'})
+# the clause keywords, only looked for around the CASE
+_CLAUSE_SCANNER = keyword_scanner(CLAUSE_WORDS | QUERY_WORDS, punctuation='()')
+# a parenthesis level starting with one of QUERY_WORDS is a (sub)query
+_QUERY_START_RE = re.compile(rf"{_BLANK}(?:{'|'.join(QUERY_WORDS)})(?![\w@#$])", re.DOTALL | re.IGNORECASE)
+
+def _new_level(is_query, start, found):
+    """State of one parenthesis level (or of the script, start=0) while extracting case statements"""
+    return {'query': is_query, 'open': start - 1, 'item_start': start, 'scan_from': start, 'item': None,
+            'cases': 0, 'found': found}
+
+def _close_item(level, end):
+    """Add the item of a level, if any, to the found items, ending before end"""
+    if level['item'] is not None:
+        level['found'].append((level['item'], end))
+        level['item'] = None
+
+def _cut_at_clauses(query, level, end):
+    """Close the item of a query level at the clause keywords between level['scan_from'] and end
+
+    The keywords inside parentheses are skipped, the next item starts after the last keyword.
+    """
+    if level['cases'] > 0:
+        return
+    depth = 0
+    for match in _CLAUSE_SCANNER.finditer(query, level['scan_from'], end):
+        text = match.group()
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif depth == 0 and match.lastgroup == 'word':
+            _close_item(level, match.start())
+            level['item_start'] = match.end()
+    level['scan_from'] = end
+
+def _item_alias(recent):
+    """Return the alias ending an item from its two last tokens, or None"""
+    prev, last = recent
+    if last is None or prev is None or last.kind not in ('word', 'quoted'):
+        return None
+    if last.text.lower() in NO_ALIAS_WORDS or last.text.lower() == 'end':
+        return None
+    if prev.kind == 'word' and prev.text.lower() == 'as':
+        return unquote(last.text)
+    if prev.text == ')' or (prev.kind in ('word', 'quoted', 'number', 'string') and prev.text.lower() not in NO_ALIAS_WORDS):
+        return unquote(last.text)
+    return None
+
+def _strip_comments(text):
+    """Return text with its comments replaced by a space, quoted strings kept"""
+    if '--' not in text and '/*' not in text:
+        return text
+    return _CASE_SCANNER.sub(lambda match: ' ' if match.lastgroup == 'comment' else match.group(), text)
+
+def extract_case_statements(query):
+    """Find the case statements of a sql script in one pass
+
+    A case statement is reported once per item (of a select list, or of any
+    other clause) containing CASE expressions, with nested CASE and CASE inside
+    function calls kept in the same item.
+
+    The script is scanned for CASE, END, parentheses, commas and semicolons
+    only (see keyword_scanner). The clause keywords ending the items are
+    looked for between these marks only when an item holds a CASE, and the
+    items are tokenized from their last END to find their end and alias.
+
+    Parameters
+    -----------
+    query: str
+        the sql script
+
+    Returns
+    --------
+    list of dict, in script order, with
+        'name': alias of the item, or 'CASE_<n>' if it has none
+        'alias': alias of the item or None
+        'statement': text of the item, comments removed and whitespace collapsed
+        'start', 'end': position of the item in the script
+        'case_start', 'case_end': position of its first CASE and of its last END
+    """
+    # most scripts have no case statement at all
+    if 'case' not in query.lower():
+        return []
+    found = []
+    levels = [_new_level(True, 0, found)]
+    level = levels[0]
+    # the innermost query level, holding the items
+    owner = level
+    for match in _CASE_SCANNER.finditer(query):
+        kind = match.lastgroup
+        if kind == 'punct':
+            text = match.group()
+            if text == ',':
+                if level['cases'] == 0 and level['query']:
+                    if level['item'] is not None:
+                        _cut_at_clauses(query, level, match.start())
+                        _close_item(level, match.start())
+                    level['item_start'] = level['scan_from'] = match.end()
+            elif text == '(':
+                level = _new_level(_QUERY_START_RE.match(query, match.end()) is not None, match.end(), found)
+                levels.append(level)
+                if level['query']:
+                    owner = level
+            elif text == ')':
+                if len(levels) > 1:
+                    if level['item'] is not None:
+                        _cut_at_clauses(query, level, match.start())
+                        _close_item(level, match.start())
+                    if levels.pop() is owner:
+                        owner = next(outer for outer in reversed(levels) if outer['query'])
+                    level = levels[-1]
+            elif len(levels) == 1:
+                # ';' ends a statement
+                if level['item'] is not None:
+                    _cut_at_clauses(query, level, match.start())
+                    _close_item(level, match.start())
+                level['item_start'] = level['scan_from'] = match.end()
+                level['cases'] = 0
+        elif kind == 'word':
+            if match.group().lower() == 'case':
+                # the clauses of the owner end before the CASE, or before the parenthesis holding it
+                if level is owner:
+                    _cut_at_clauses(query, owner, match.start())
+                else:
+                    _cut_at_clauses(query, owner, levels[levels.index(owner) + 1]['open'])
+                level['cases'] += 1
+                if owner['item'] is None:
+                    owner['item'] = (owner['item_start'], match.start(), [None])
+            elif level['cases'] > 0:
+                # END
+                level['cases'] -= 1
+                if owner['item'] is not None:
+                    owner['item'][2][0] = match.start()
+                if level['cases'] == 0:
+                    level['scan_from'] = match.end()
+    # close what is left open
+    for level in reversed(levels):
+        if level['item'] is not None:
+            _cut_at_clauses(query, level, len(query))
+            _close_item(level, len(query))
+
+    # build the statements in script order
+    found.sort(key=lambda found_item: found_item[0][0])
+    case_statements = []
+    for number, ((start, case_start, (last_end,)), end) in enumerate(found, 1):
+        # the item runs from its first to its last token, its alias is in its two last tokens
+        start = _BLANK_RE.match(query, start).end()
+        tail_start = last_end if last_end is not None else case_start
+        tokens = tokenize_sql(query[tail_start:end], keep_comments=False)
+        end = tail_start + tokens[-1].end
+        alias = _item_alias([tokens[-2] if len(tokens) > 1 else None, tokens[-1]])
+        case_statements.append({
+            'start': start, 'case_start': case_start, 'case_end': last_end + 3 if last_end is not None else None,
+            'end': end, 'alias': alias,
+            'statement': ' '.join(_strip_comments(query[start:end]).split()),
+            'name': alias if alias else f'CASE_{number}'})
+    return case_statements
+
 def parseCase(query):
-    splitedquery = query.split(",")
-    split_list = query.split(",")
-    need_join = False
-    join_list = []
-    for sentence in split_list:
-        if need_join:
-            join_list[-1] = join_list[-1] + "," + sentence
+    """Return the case statements of a sql script as a list of {name: statement}"""
+    return [{case['name']: case['statement']} for case in extract_case_statements(query)]
+
+# what the subqueries are found with: AS and the parentheses
+_SUBQUERY_SCANNER = keyword_scanner({'as'}, punctuation='()')
+# a parenthesis starting with SELECT is a subquery
+_SUBQUERY_START_RE = re.compile(rf"{_BLANK}select(?![\w@#$])", re.DOTALL | re.IGNORECASE)
+# the alias following a subquery, with or without AS
+_SUBQUERY_ALIAS_RE = re.compile(rf"""{_BLANK}(?:(?P<as>as)(?![\w@#$]){_BLANK})?
+                                    (?P<alias>"[^"]*"|`[^`]*`|\[[^\]]*\]|[\w@#$]+)""",
+                                re.DOTALL | re.IGNORECASE | re.VERBOSE)
+# words which can follow a subquery without being its alias
+NOT_ALIAS_WORDS = CLAUSE_WORDS | NO_ALIAS_WORDS | {'left', 'right', 'inner', 'outer', 'full', 'cross', 'natural',
+                                                  'end', 'as', 'all', 'offset', 'fetch'}
+
+def find_subqueries(query):
+    """Find the subqueries of a sql script in one pass, innermost first
+
+    A subquery is a parenthesis starting with SELECT, but not the body of a
+    CTE or a view (a parenthesis following AS). It is named by the alias
+    following it, or 'subquery_<n>' if it has none.
+
+    Parameters
+    -----------
+    query: str
+        the sql script
+
+    Returns
+    --------
+    dict of {name: text of the subquery, comments removed and whitespace collapsed}
+    """
+    subqueries = {}
+    # (start, is a subquery) of the open parentheses
+    opened = []
+    as_end = None
+    unnamed = 0
+    for match in _SUBQUERY_SCANNER.finditer(query):
+        if match.lastgroup == 'word':
+            as_end = match.end()
+        elif match.lastgroup == 'punct' and match.group() == '(':
+            after_as = as_end is not None and _BLANK_RE.match(query, as_end).end() == match.start()
+            opened.append((match.end(), not after_as and _SUBQUERY_START_RE.match(query, match.end()) is not None))
+        elif match.lastgroup == 'punct' and len(opened) > 0:
+            start, is_subquery = opened.pop()
+            if not is_subquery:
+                continue
+            alias = _SUBQUERY_ALIAS_RE.match(query, match.end())
+            if alias is not None and (alias.group('as') or alias.group('alias').lower() not in NOT_ALIAS_WORDS):
+                name = unquote(alias.group('alias'))
+            else:
+                unnamed += 1
+                name = f'subquery_{unnamed}'
+            subqueries[name] = ' '.join(_strip_comments(query[start:match.start()]).split())
+    return subqueries
+
+# name -> function(analysis) computing one result of a ScriptAnalysis
+EXTRACTORS = {}
+
+def register_extractor(name):
+    """Decorator adding an extractor to ScriptAnalysis, available as analysis.get(name)"""
+    def register(func):
+        EXTRACTORS[name] = func
+        return func
+    return register
+
+class ScriptAnalysis:
+    """Analysis of one sql script, computed lazily and at most once
+
+    The subqueries and case statements are found by a keyword scan of the
+    script, the tables and columns by a sql_metadata Parser, and the table
+    lineage from the tokens of tokenize_sql, each made once and only if asked.
+    """
+    def __init__(self, script):
+        """
+        Parameters
+        -------------
+        script: str
+            the sql script
+        """
+        self.script = script
+        self._parser = None
+        self._tokens = None
+        self._results = {}
+
+    @property
+    def parser(self):
+        """The sql_metadata parser of the script"""
+        if self._parser is None:
+            self._parser = Parser(self.script)
+        return self._parser
+
+    @property
+    def tokens(self):
+        """The tokens of the script, see sql_tokenizer.tokenize_sql"""
+        if self._tokens is None:
+            self._tokens = tokenize_sql(self.script)
+        return self._tokens
+
+    def get(self, name):
+        """Return the result of the extractor `name`, computing it the first time"""
+        if name not in self._results:
+            self._results[name] = EXTRACTORS[name](self)
+        return self._results[name]
+
+    @property
+    def subqueries(self):
+        """The subqueries of the script as {alias: query}"""
+        return self.get('subqueries')
+
+    @property
+    def case_statements(self):
+        """The case statements of the script as a list of {name: statement}"""
+        return self.get('case_statements')
+
+    @property
+    def tables(self):
+        """The tables used by the script"""
+        return self.get('tables')
+
+    @property
+    def columns(self):
+        """The columns used by the script"""
+        return self.get('columns')
+
+@register_extractor('subqueries')
+def _extract_subqueries(analysis):
+    return find_subqueries(analysis.script)
+
+@register_extractor('case_statements')
+def _extract_case_statements(analysis):
+    return parseCase(analysis.script)
+
+@register_extractor('tables')
+def _extract_tables(analysis):
+    return analysis.parser.tables
+
+@register_extractor('columns')
+def _extract_columns(analysis):
+    return analysis.parser.columns
+
+
+# words which can come between CREATE and TABLE/VIEW/PROCEDURE
+CREATE_MODIFIERS = {'or', 'replace', 'alter', 'temporary', 'temp', 'global', 'local', 'unlogged', 'materialized',
+                    'external', 'transient', 'volatile', 'multiset', 'recursive', 'secure'}
+
+def _read_name(tokens, index):
+    """Read a dotted object name starting at tokens[index], return (name, next index)"""
+    parts = []
+    while index < len(tokens) and tokens[index].kind in ('word', 'quoted'):
+        parts.append(unquote(tokens[index].text))
+        index += 1
+        if index + 1 < len(tokens) and tokens[index].text == '.':
+            index += 1
         else:
-            join_list.append(sentence)
-        if "case" in sentence.lower():
-            need_join = True
-        if "end" in sentence.lower():
-            need_join = False
-
-    caselist = []
-    # for i in splitedquery :
-    for i in join_list:
-        if (("CASE" in i) | ("case" in i)):
-            casename = i.split(" ")[len(i.split(" ")) - 1]
-            casedict = {'name': casename, 'statement': ' '.join(i.split())}
-            caselist.append(casedict)
-    # print("List format case statement")
-    # 不要这个格式
-    # print(caselist)
-    caselist2 = []
-    for i in caselist:
-        casedict2 = {i['name']: i['statement']}
-        caselist2.append(casedict2)
-    # 这个是对的
-    # print(caselist2)
-    book = xlwt.Workbook()
-    sheet = book.add_sheet('sheet1')
-    title = ['Name', 'Case statement']
-    row = 0
-    for t in title:
-        sheet.write(0, row, t)
-        row += 1
-
-    for d in caselist:
-        col = 0
-        for one in d.keys():
-            sheet.write(row, col, d[one])
-            col += 1
-        row += 1
-    book.save('Case1.xls')
-    return caselist2
+            break
+    return '.'.join(parts), index
+
+def _skip_words(tokens, index, words):
+    """Return the index of the first token from `index` which is not one of `words`"""
+    while index < len(tokens) and tokens[index].kind == 'word' and tokens[index].text.lower() in words:
+        index += 1
+    return index
+
+def split_statements(tokens):
+    """Split tokens at the ';' outside parentheses, return the list of non empty statements"""
+    statements, current, depth = [], [], 0
+    for token in tokens:
+        if token.text == '(':
+            depth += 1
+        elif token.text == ')':
+            depth = max(depth - 1, 0)
+        elif token.text == ';' and depth == 0:
+            if len(current) > 0:
+                statements.append(current)
+            current = []
+            continue
+        current.append(token)
+    if len(current) > 0:
+        statements.append(current)
+    return statements
+
+def find_table_writes(tokens):
+    """Find the objects written and defined by a script from its tokens
+
+    Returns
+    --------
+    targets: list of (name, type_desc)
+        the tables (or views) written by INSERT, UPDATE, MERGE, SELECT INTO and CREATE TABLE/VIEW
+
+    procedure: str or None
+        the name of the procedure or function created by the script
+    """
+    tokens = [token for token in tokens if token.kind != 'comment']
+    targets, procedure = [], None
+    last_statement = None
+    # inside a MERGE (until the next ';'), whose WHEN ... THEN UPDATE / INSERT write its target
+    in_merge = False
+    for index, token in enumerate(tokens):
+        if token.text == ';':
+            in_merge = False
+        if token.kind != 'word':
+            continue
+        word = token.text.lower()
+        previous = tokens[index - 1].text.lower() if index > 0 else ''
+        name, kind = None, 'TABLE'
+        if word in ('insert', 'update') and in_merge and previous == 'then':
+            continue
+        if word in ('insert', 'merge'):
+            last_statement = word
+            in_merge = word == 'merge'
+            name, _ = _read_name(tokens, _skip_words(tokens, index + 1, {'into', 'overwrite', 'table', 'ignore'}))
+        elif word == 'update' and previous not in ('key', 'for', 'on'):
+            name, _ = _read_name(tokens, _skip_words(tokens, index + 1, {'only'}))
+        elif word == 'select':
+            last_statement = word
+        elif word == 'into' and last_statement == 'select' and previous not in ('insert', 'merge'):
+            name, _ = _read_name(tokens, _skip_words(tokens, index + 1, {'temporary', 'temp', 'unlogged', 'table'}))
+        elif word == 'create':
+            position = _skip_words(tokens, index + 1, CREATE_MODIFIERS)
+            if position < len(tokens):
+                what = tokens[position].text.lower()
+                position = _skip_words(tokens, position + 1, {'if', 'not', 'exists'})
+                if what in ('table', 'view'):
+                    name, _ = _read_name(tokens, position)
+                    kind = what.upper()
+                elif what in ('procedure', 'proc', 'function') and procedure is None:
+                    procedure, _ = _read_name(tokens, position)
+        if name:
+            targets.append((name, kind))
+    return targets, procedure
+
+def find_table_reads(tokens):
+    """Find the tables read by a script (or one statement) from its tokens (after FROM, JOIN and USING)"""
+    tokens = [token for token in tokens if token.kind != 'comment']
+    sources, cte_names = [], set()
+    # one flag per open parenthesis: is it a (sub)query
+    query_levels = [True]
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        word = token.text.lower() if token.kind == 'word' else None
+        if token.text == '(':
+            # `name AS (` defines a common table expression
+            if index >= 2 and tokens[index - 1].text.lower() == 'as' and tokens[index - 2].kind in ('word', 'quoted'):
+                cte_names.add(unquote(tokens[index - 2].text).lower())
+            query_levels.append(False)
+        elif token.text == ')' and len(query_levels) > 1:
+            query_levels.pop()
+        elif word == 'select':
+            query_levels[-1] = True
+        elif word in ('from', 'join', 'using') and query_levels[-1]:
+            # read `name [AS alias] [, name [AS alias]]...`
+            while True:
+                name, index = _read_name(tokens, index + 1)
+                if not name or name.lower() in ('select', 'lateral', 'unnest'):
+                    break
+                sources.append(name)
+                index = _skip_words(tokens, index, {'as'})
+                if index < len(tokens) and tokens[index].kind in ('word', 'quoted') \
+                        and tokens[index].text.lower() not in CLAUSE_WORDS | {'left', 'right', 'inner', 'outer', 'full', 'cross', 'natural', 'when', 'with'}:
+                    index += 1
+                if index >= len(tokens) or tokens[index].text != ',':
+                    break
+            continue
+        index += 1
+    return [name for name in sources if name.lower() not in cte_names]
+
+@register_extractor('table_lineage')
+def _extract_table_lineage(analysis):
+    """{'statements': [{'sources': [...], 'targets': [(name, type_desc), ...]}, ...], 'procedure': name or None}
+
+    The tables read and written are found statement by statement, so that the
+    tables read by a statement only feed the tables written by the same one.
+    """
+    tokens = [token for token in analysis.tokens if token.kind != 'comment']
+    statements, procedure = [], None
+    for statement in split_statements(tokens):
+        targets, created = find_table_writes(statement)
+        procedure = procedure or created
+        # a written table (or the procedure itself) is not a source
+        written = {name.lower() for name, _ in targets} | {procedure.lower() if procedure else None}
+        sources = list(dict.fromkeys(name for name in find_table_reads(statement) if name.lower() not in written))
+        if len(sources) > 0 or len(targets) > 0:
+            statements.append({'sources': sources, 'targets': targets})
+    return {'statements': statements, 'procedure': procedure}
+
+def _table_lineage_safe(script):
+    """Table lineage of one script, returning (lineage, None) or (None, error message)"""
+    try:
+        return ScriptAnalysis(script).get('table_lineage'), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def iter_table_lineage(scripts, workers=1, chunksize=16):
+    """Yield (position, lineage, error) for every script in order, as soon as it is parsed
+
+    Parameters
+    -----------
+    scripts: list of str
+        the sql scripts
+
+    workers: int
+        number of worker processes, 1 parses in the current process (default: 1)
+
+    chunksize: int
+        number of scripts sent to a worker at a time (default: 16)
+    """
+    if workers is None or workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for position, (lineage, error) in enumerate(executor.map(_table_lineage_safe, scripts, chunksize=chunksize)):
+                yield position, lineage, error
+    else:
+        for position, script in enumerate(scripts):
+            lineage, error = _table_lineage_safe(script)
+            yield position, lineage, error
+
+class TableLineageBuilder:
+    """Accumulate the table level lineage of scripts into node and edge data
+
+    Tables are matched case insensitively and keep the spelling seen first.
+    The tables read by a statement feed the tables written by the same
+    statement, so a temporary table gives two hops (source -> #tmp -> target).
+    A script which writes no table becomes a node itself, fed by the tables it
+    reads (named after the procedure it creates, or `script_<n>`).
+    """
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+        self.errors = {}
+        self.n_scripts = 0
+
+    def _node(self, name, type_desc):
+        key = name.lower()
+        if key not in self.nodes:
+            self.nodes[key] = {'id': name, 'type_desc': type_desc}
+        return self.nodes[key]['id']
+
+    def add_lineage(self, lineage, name=None):
+        """Add the lineage of one script (as given by ScriptAnalysis) and return its new edges"""
+        self.n_scripts += 1
+        name = name or lineage['procedure'] or f'script_{self.n_scripts}'
+        statements = lineage['statements']
+        if any(len(statement['targets']) > 0 for statement in statements):
+            # the tables read by a statement feed the tables written by it
+            hops = [([self._node(target, type_desc) for target, type_desc in statement['targets']], statement['sources'])
+                    for statement in statements]
+        else:
+            type_desc = 'SQL_STORED_PROCEDURE' if lineage['procedure'] else 'SQL_SCRIPT'
+            hops = [([self._node(name, type_desc)], [source for statement in statements for source in statement['sources']])]
+        new_edges = []
+        # every edge counts the script once
+        seen = set()
+        for targets, sources in hops:
+            for source in sources:
+                source = self._node(source, 'TABLE')
+                for target in targets:
+                    key = (source, target)
+                    if source == target or key in seen:
+                        continue
+                    seen.add(key)
+                    if key not in self.edges:
+                        self.edges[key] = {'from': source, 'to': target, 'scripts': 0}
+                        new_edges.append(key)
+                    self.edges[key]['scripts'] += 1
+        return new_edges
+
+    def add_script(self, script, name=None):
+        """Parse one script and add its lineage, return its new edges"""
+        return self.add_lineage(ScriptAnalysis(script).get('table_lineage'), name)
+
+    def add_scripts(self, scripts, names=None, workers=1, chunksize=16):
+        """Parse many scripts (see iter_table_lineage) and add their lineage"""
+        for position, lineage, error in iter_table_lineage(scripts, workers, chunksize):
+            name = names[position] if names is not None else None
+            if error is not None:
+                self.n_scripts += 1
+                self.errors[name or f'script_{self.n_scripts}'] = error
+                continue
+            self.add_lineage(lineage, name)
+        return self
+
+    def to_dataframes(self):
+        """Return (edge_df, node_df) ready for parse_dataframe or Jaal"""
+        edge_df = pd.DataFrame(list(self.edges.values()), columns=['from', 'to', 'scripts'])
+        node_df = pd.DataFrame(list(self.nodes.values()), columns=['id', 'type_desc'])
+        return edge_df, node_df
+
+def build_table_lineage(scripts, names=None, workers=1, chunksize=16):
+    """Return the table level lineage of sql scripts as (edge_df, node_df)
+
+    Parameters
+    -----------
+    scripts: list of str
+        the sql scripts
+
+    names: list of str (optional)
+        the name of every script, used for the scripts writing no table
+
+    workers: int
+        number of worker processes, 1 parses in the current process (default: 1)
+
+    chunksize: int
+        number of scripts sent to a worker at a time (default: 16)
+    """
+    builder = TableLineageBuilder().add_scripts(scripts, names, workers, chunksize)
+    if len(builder.errors) > 0:
+        print(f"failed to parse {len(builder.errors)} of {builder.n_scripts} sql scripts!!")
+    return builder.to_dataframes()
+
+def build_column_lineage(scripts, names=None, index=None):
+    """Return the column level lineage of sql scripts as a ColumnLineageIndex
+
+    Parameters
+    -----------
+    scripts: list of str
+        the sql scripts
+
+    names: list of str (optional)
+        the name of every script, used for the scripts writing no table and to
+        prefix subquery names (default: `script_<n>`)
+
+    index: ColumnLineageIndex (optional)
+        index to add the lineage to, a new one if not given
+    """
+    if index is None:
+        index = ColumnLineageIndex()
+    failed = 0
+    for position, script in enumerate(scripts):
+        name = names[position] if names is not None else f'script_{index.n_scripts + 1}'
+        index.n_scripts += 1
+        try:
+            index.add_edges(extract_column_lineage(script, name, ScriptAnalysis(script).tokens))
+        except Exception:
+            failed += 1
+    if failed > 0:
+        print(f"failed to parse {failed} of {len(scripts)} sql scripts!!")
+    return index
+
+
+def export_case_statements(case_lists, path, script_names=None):
+    """Write the case statements of many scripts to a single file
+
+    Parsing does not write anything to disk, call this once on the parsed
+    scripts to export them.
+
+    Parameters
+    -----------
+    case_lists: list
+        the output of parseCase for every script
+
+    path: str
+        the file to write, the format follows the extension: .csv, .xls (needs
+        xlwt, at most 65535 statements) or .xlsx (needs openpyxl)
+
+    script_names: list (optional)
+        the name of every script, written in the 'Script' column (default: the script position)
+
+    Returns
+    --------
+    the number of case statements written
+    """
+    header = ['Script', 'Name', 'Case statement']
+    rows = []
+    for index, case_list in enumerate(case_lists):
+        script = script_names[index] if script_names is not None else index
+        for case in case_list:
+            for name, statement in case.items():
+                rows.append([script, name, statement])
+    # write in the requested format
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    elif extension == '.xls':
+        import xlwt
+        book = xlwt.Workbook()
+        sheet = book.add_sheet('sheet1')
+        for row, values in enumerate([header] + rows):
+            for col, value in enumerate(values):
+                sheet.write(row, col, value)
+        book.save(path)
+    elif extension == '.xlsx':
+        pd.DataFrame(rows, columns=header).to_excel(path, index=False)
+    else:
+        raise Exception(f"Unsupported export format '{extension}', use .csv, .xls or .xlsx")
+    return len(rows)
 
 
 # 封装了之前的功能，把parse case和subquery放在了一个函数中
 def parse_subquery_and_case(query):
-    subquery_list = Parser(query).subqueries
-    case_list = parseCase(query)[0]
+    analysis = ScriptAnalysis(query)
+    subquery_list = analysis.subqueries
+    case_list = analysis.case_statements[0]
 
     return [subquery_list, case_list]
 
-def parse_subquery_and_case2(query):
+def _parse_script(script):
+    """Return [subqueries, first case statement] of one script"""
+    analysis = ScriptAnalysis(script)
+    case_list = analysis.case_statements
+    return [analysis.subqueries, case_list[0] if len(case_list) > 0 else {}]
+
+def _parse_script_safe(script):
+    """Parse one script, returning (result, None) or (None, error message)
+
+    Runs in the worker processes, so a script which fails to parse does not
+    abort the rest of the batch.
+    """
+    try:
+        return _parse_script(script), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def parse_scripts_parallel(scripts, workers=None, chunksize=16):
+    """Parse many scripts over a process pool
+
+    Scripts found in the parse cache and duplicated scripts are only parsed once.
+    Small batches (not more than `chunksize` scripts to parse) or `workers=1`
+    are parsed in the current process.
+
+    Parameters
+    -----------
+    scripts: list of str
+        the sql scripts to parse
+
+    workers: int (optional)
+        number of worker processes (default: number of cpus)
+
+    chunksize: int
+        number of scripts sent to a worker at a time (default: 16)
+
+    Returns
+    --------
+    results: list
+        [subqueries, first case statement] of every script in input order, None if it failed
+
+    errors: list
+        the error message of every script in input order, None if it succeeded
+
+    stats: dict
+        'scripts', 'parsed', 'cached', 'failed', 'seconds' and 'scripts_per_sec' of the batch
+    """
+    start = time.perf_counter()
+    scripts = list(scripts)
+    keys = [content_hash(script) for script in scripts]
+    results = [parse_cache.get(key) for key in keys]
+    errors = [None]*len(scripts)
+    # positions of every distinct script left to parse
+    todo = {}
+    for position, (key, result) in enumerate(zip(keys, results)):
+        if result is None:
+            todo.setdefault(key, []).append(position)
+    todo_scripts = [scripts[positions[0]] for positions in todo.values()]
+    # parse them
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(todo_scripts) <= chunksize:
+        parsed = [_parse_script_safe(script) for script in todo_scripts]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_script_safe, todo_scripts, chunksize=chunksize))
+    # store and spread the results
+    for (key, positions), (result, error) in zip(todo.items(), parsed):
+        if error is None:
+            parse_cache.put(key, result)
+        for position in positions:
+            results[position], errors[position] = result, error
+    # report the throughput
+    seconds = time.perf_counter() - start
+    stats = {
+        'scripts': len(scripts),
+        'parsed': len(todo_scripts),
+        'cached': len(scripts) - sum(len(positions) for positions in todo.values()),
+        'failed': sum(error is not None for error in errors),
+        'seconds': seconds,
+        'scripts_per_sec': len(scripts) / seconds if seconds > 0 else float('inf'),
+    }
+    return results, errors, stats
+
+def parse_subquery_and_case2(query, workers=None, chunksize=16):
+    results, errors, stats = parse_scripts_parallel(query, workers=workers, chunksize=chunksize)
+    if stats['failed'] > 0:
+        print(f"failed to parse {stats['failed']} of {stats['scripts']} sql scripts!!")
     subquery_list = []
     case_list = []
-    for i in query:
-        subquery_list.append(Parser(i).subqueries)
-        case_list.append(parseCase(i)[0])
-    
+    for result in results:
+        # failed scripts show nothing
+        subquery, case = result if result is not None else [{}, {}]
+        subquery_list.append(subquery)
+        case_list.append(case)
 
     return [subquery_list, case_list]
 
@@ -0,0 +1,41 @@
+"""
+The node and edge attributes sent to the browser
+
+The graph keeps every column of the node and edge dataframes. The network
+only needs the attributes it draws, so the graph sent to the browser keeps
+just those, while the other columns (used to filter, color and size the
+graph) stay on the server, in the tables of the GraphModel.
+"""
+
+# imports
+from .graph_model import to_dicts
+
+# the attributes drawn by the network
+RENDER_FIELDS = {
+    'nodes': ('id', 'label', 'title', 'color', 'size', 'shape', 'x', 'y', 'hidden'),
+    'edges': ('id', 'from', 'to', 'label', 'title', 'color', 'width', 'hidden'),
+}
+
+# payload profiles: 'render' sends the drawn attributes, 'full' every column
+PAYLOAD_PROFILES = {'render': RENDER_FIELDS, 'full': None}
+
+def payload_fields(profile):
+    """Return the attributes sent for a payload profile ('render' or 'full'), None for all of them"""
+    if profile not in PAYLOAD_PROFILES:
+        raise Exception(f"Unknown payload profile '{profile}', expected one of {list(PAYLOAD_PROFILES)}.")
+    return PAYLOAD_PROFILES[profile]
+
+def render_graph(data, fields=RENDER_FIELDS):
+    """Return the graph to send to the browser, as {'nodes': [...], 'edges': [...]}
+
+    Parameters
+    -----------
+    data: dict or GraphModel
+        the graph (e.g. the filtered data of a GraphState)
+
+    fields: dict
+        'nodes' and 'edges' -> the attributes to keep, None keeps all of them
+        (default: RENDER_FIELDS)
+    """
+    return {kind: to_dicts(data[kind], None if fields is None else fields[kind])
+            for kind in ('nodes', 'edges')}
@@ -0,0 +1,334 @@
+"""
+Per session graph state, kept on the server
+
+Every browser session (identified by the id stored in the `session-id`
+dcc.Store of the layout) gets its own GraphState, so the search, filters,
+colors and sizes of one analyst never change the graph of another. The states
+are kept in an in-process LRU cache, optionally backed by a shared store (on
+disk or redis) so that several worker processes serve the same sessions.
+
+The shared store holds what is proper to a session (its filters, colors,
+sizes and clusters, see GraphState.session) and, once per graph, the graph
+itself: a worker rebuilds a session from the graph it has in memory (or loads
+it from the store once) instead of loading the whole graph at every callback.
+
+The shared stores hold pickles and must only be reachable by the app itself.
+"""
+
+# imports
+import os
+import uuid
+import pickle
+import threading
+from .cache import LRUCache
+from .graph_index import GraphIndex
+from .label_index import LabelIndex
+from .filters import GraphTables, FilterPipeline
+
+class GraphState:
+    """The graph of one session with its indexes, filters and color mappings
+
+    States forked from the same graph share its node and edge tables and its
+    indexes until they modify them (see own_data).
+    """
+    def __init__(self, data, scaling_vars, graph_key=None, graph_index=None):
+        """
+        Parameters
+        -------------
+        data: GraphModel
+            the graph, see GraphModel.from_dataframes
+
+        scaling_vars: dict
+            min and max of the numerical node and edge columns, see parse_dataframe
+
+        graph_key: str (optional)
+            identifies the graph (e.g. the hash of the uploaded files)
+
+        graph_index: GraphIndex (optional)
+            the index of data, built if not given
+        """
+        self.data, self.scaling_vars = data, scaling_vars
+        self.graph_key = graph_key
+        self.graph_index = graph_index if graph_index is not None else GraphIndex(data)
+        # the index of the node labels, made on first use and shared with the forks
+        self._label_index = [None]
+        self.filtered_data = data
+        self.node_value_color_mapping = {}
+        self.edge_value_color_mapping = {}
+        self.pipeline = FilterPipeline()
+        # the columns (and scales) the nodes and edges are colored and sized by:
+        # 'color_nodes', 'color_edges' -> column, 'size_nodes', 'size_edges' -> (column, scale)
+        self.styles = {}
+        # the graph held by the browser, for delta updates (None: unknown)
+        self.sent = None
+        # level of detail: the node column the nodes are clustered by (None: no
+        # clusters), the values whose cluster is expanded and the shown cluster nodes
+        self.cluster_by = None
+        self.expanded = set()
+        self.cluster_ids = {}
+        self.lock = threading.RLock()
+        self._tables = None
+        # the kinds ('nodes', 'edges') whose tables belong to this state
+        self._owns_data = {'nodes', 'edges'} if graph_index is None else set()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # rebuilt when needed
+        del state['lock']
+        state['_tables'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    @property
+    def sent(self):
+        return self._sent
+
+    @sent.setter
+    def sent(self, sent):
+        # identifies what the browser holds, without storing it with the session
+        self._sent = sent
+        self.sent_token = uuid.uuid4().hex if sent is not None else None
+
+    def session(self):
+        """Return what is proper to the session, as stored by a SessionStore backend
+
+        The graph is left out: it is found again by graph_key (see restore).
+        """
+        return {'graph_key': self.graph_key, 'pipeline': self.pipeline, 'styles': dict(self.styles),
+                'cluster_by': self.cluster_by, 'expanded': set(self.expanded), 'cluster_ids': dict(self.cluster_ids),
+                'sent_token': self.sent_token}
+
+    def restore(self, session):
+        """Set the filters and clusters of a session on this (forked) state and return it
+
+        The colors and sizes of session['styles'] are applied by the caller.
+        """
+        self.pipeline = session['pipeline']
+        self.pipeline.clear_result()
+        self.cluster_by = session['cluster_by']
+        self.expanded = set(session['expanded'])
+        self.cluster_ids = dict(session['cluster_ids'])
+        return self
+
+    def keep_sent(self, previous, sent_token):
+        """Keep the graph sent by `previous` (a former state of the session) if it is still the one held by the browser"""
+        if previous is not None and sent_token is not None and previous.sent_token == sent_token:
+            self._sent, self.sent_token = previous._sent, sent_token
+
+    def fork(self):
+        """Return a new state showing the same (unfiltered, collapsed) graph, sharing its data and indexes"""
+        state = GraphState(self.data, self.scaling_vars, self.graph_key, self.graph_index)
+        state._label_index = self._label_index
+        state.cluster_by = self.cluster_by
+        return state
+
+    def own_data(self, kinds=('nodes', 'edges')):
+        """Copy the shared node (and/or edge) table before modifying it
+
+        The copies hold the same values, so the masks of the tables stay valid.
+        """
+        shared = [kind for kind in kinds if kind not in self._owns_data]
+        if len(shared) > 0:
+            self.data = self.data.copy(shared)
+            self._owns_data.update(shared)
+            if self._tables is not None:
+                self._tables.tables = self.data.tables
+            self.pipeline.clear_result()
+
+    @property
+    def label_index(self):
+        """The index of the node labels (for the search suggestions), made on first use"""
+        if self._label_index[0] is None:
+            self._label_index[0] = LabelIndex(self.data.labels())
+        return self._label_index[0]
+
+    @property
+    def tables(self):
+        """The node and edge tables of the graph with their filter masks, made on first use"""
+        if self._tables is None:
+            self._tables = GraphTables(self.data)
+        return self._tables
+
+class DiskBackend:
+    """Keep the session states (and graphs) as pickle files in a directory shared by the workers
+    """
+    def __init__(self, path):
+        """
+        Parameters
+        -------------
+        path: str
+            the directory of the files, created if missing
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, session_id):
+        return os.path.join(self.path, f"{session_id}.pkl")
+
+    def version(self, session_id):
+        """Return the version of the stored state, None if there is none"""
+        try:
+            return os.stat(self._file(session_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, session_id):
+        try:
+            with open(self._file(session_id), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, file, value):
+        temporary = file + f".{os.getpid()}.{threading.get_ident()}"
+        with open(temporary, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, file)
+
+    def save(self, session_id, state):
+        """Store the state and return its version"""
+        self._write(self._file(session_id), state)
+        return self.version(session_id)
+
+    def _graph_file(self, graph_key):
+        return os.path.join(self.path, f"graph-{graph_key}.pkl")
+
+    def load_graph(self, graph_key):
+        try:
+            with open(self._graph_file(graph_key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_graph(self, graph_key, graph):
+        """Store a graph, once: a graph_key always stands for the same graph"""
+        if not os.path.exists(self._graph_file(graph_key)):
+            self._write(self._graph_file(graph_key), graph)
+
+class RedisBackend:
+    """Keep the session states (and graphs) in redis (or a redis compatible server)
+    """
+    def __init__(self, url="redis://localhost:6379/0", prefix="jaal:session:", expire=24 * 3600):
+        """
+        Parameters
+        -------------
+        url: str
+            the url of the server (default: redis://localhost:6379/0)
+
+        prefix: str
+            prefix of the keys (default: 'jaal:session:')
+
+        expire: int
+            seconds a session is kept after its last change (default: one day)
+        """
+        try:
+            import redis
+        except ImportError:
+            raise Exception("RedisBackend needs the redis package, install it with `pip install redis`.")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.expire = expire
+
+    def version(self, session_id):
+        version = self.client.get(f"{self.prefix}{session_id}:version")
+        return int(version) if version is not None else None
+
+    def load(self, session_id):
+        value = self.client.get(f"{self.prefix}{session_id}")
+        return pickle.loads(value) if value is not None else None
+
+    def save(self, session_id, state):
+        key = f"{self.prefix}{session_id}"
+        pipe = self.client.pipeline()
+        pipe.set(key, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), ex=self.expire)
+        pipe.incr(f"{key}:version")
+        pipe.expire(f"{key}:version", self.expire)
+        return pipe.execute()[1]
+
+    def load_graph(self, graph_key):
+        key = f"{self.prefix}graph:{graph_key}"
+        value = self.client.get(key)
+        if value is None:
+            return None
+        self.client.expire(key, self.expire)
+        return pickle.loads(value)
+
+    def save_graph(self, graph_key, graph):
+        """Store a graph, once: a graph_key always stands for the same graph"""
+        key = f"{self.prefix}graph:{graph_key}"
+        if not self.client.exists(key):
+            self.client.set(key, pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL), ex=self.expire, nx=True)
+
+class SessionStore:
+    """Session id -> GraphState, in an LRU cache optionally backed by a shared store
+
+    With a backend, a state is read from the backend only when its version
+    changed since this process last saw it, and is written back by save. The
+    backend holds the session of the state only (see GraphState.session), the
+    state being rebuilt from its graph by the `restore` function given to get.
+    """
+    def __init__(self, maxsize=64, backend=None):
+        """
+        Parameters
+        -------------
+        maxsize: int
+            number of session states kept in memory (default: 64)
+
+        backend: DiskBackend, RedisBackend or None
+            shared store of the states, needed when running several worker
+            processes (default: None, states only live in this process)
+        """
+        self.backend = backend
+        # session id -> (version, state)
+        self._states = LRUCache(maxsize=maxsize)
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, session_id, create, restore=None):
+        """Return the state of a session
+
+        Parameters
+        -----------
+        session_id: str
+            the id of the session
+
+        create: function
+            `create()` returns the state of a new session
+
+        restore: function (optional)
+            `restore(session)` returns the state of a stored session (see
+            GraphState.session), None if its graph is not found
+        """
+        if self.backend is None:
+            return self._states.get_or_compute(session_id, lambda: (None, create()))[1]
+        version = self.backend.version(session_id)
+        cached = self._states.get(session_id)
+        if cached is not None and version is not None and cached[0] == version:
+            return cached[1]
+        session = self.backend.load(session_id) if version is not None else None
+        state = restore(session) if session is not None and restore is not None else None
+        if state is None:
+            return self.save(session_id, create())
+        # the browser still holds the graph this process sent, unless another one sent it since
+        state.keep_sent(cached[1] if cached is not None else None, session['sent_token'])
+        self._states.put(session_id, (version, state))
+        return state
+
+    def save(self, session_id, state):
+        """Store the (modified) state of a session and return it"""
+        version = self.backend.save(session_id, state.session()) if self.backend is not None else None
+        self._states.put(session_id, (version, state))
+        return state
+
+    def load_graph(self, graph_key):
+        """Return the graph (a GraphState) stored by another process, None if missing"""
+        return self.backend.load_graph(graph_key) if self.backend is not None else None
+
+    def save_graph(self, graph_key, graph):
+        """Store a graph (a GraphState) for the other processes, with a backend"""
+        if self.backend is not None:
+            self.backend.save_graph(graph_key, graph)
@@ -0,0 +1,87 @@
+"""
+Split a sql script into tokens in a single pass
+
+The tokenizer only knows enough of sql to not be fooled by quoted strings,
+quoted identifiers and comments: keywords inside them are never seen as words.
+
+A keyword scanner (see keyword_scanner) matches only some keywords and
+punctuation, skipping the rest of the script inside the regex engine, for the
+extractions which do not need every word.
+"""
+
+# imports
+import re
+from collections import namedtuple
+
+# kind: 'word', 'string', 'quoted', 'number', 'comment' or 'punct'
+# start, end: position of the token in the script (end excluded)
+Token = namedtuple('Token', ['kind', 'text', 'start', 'end'])
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<string>'(?:[^']|'')*'?|‘[^’]*’?)
+    | (?P<quoted>"(?:[^"]|"")*"?|`[^`]*`?|\[[^\]]*\]?)
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)
+    | (?P<word>[^\W\d]\w*|[@#$]+\w*)
+    | (?P<punct>\S)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+def tokenize_sql(query, keep_comments=True):
+    """Return the list of tokens of a sql script, whitespace excluded
+
+    Parameters
+    -----------
+    query: str
+        the sql script
+
+    keep_comments: boolean
+        keep the comment tokens in the list (default: True)
+    """
+    tokens = []
+    append = tokens.append
+    for match in _TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        if kind == 'comment' and not keep_comments:
+            continue
+        append(Token(kind, match.group(kind), match.start(kind), match.end()))
+    return tokens
+
+# quoted strings and identifiers, skipped by the keyword scanners
+_QUOTED = r"""'(?:[^']|'')*'?|‘[^’]*’?|"(?:[^"]|"")*"?|`[^`]*`?|\[[^\]]*\]?"""
+
+def keyword_scanner(words, punctuation='(),;'):
+    """Return a compiled regex finding the given keywords and punctuation of a sql script
+
+    Its matches are in the groups 'comment', 'quoted' (quoted strings and
+    identifiers, to skip), 'word' (one of words, in any case) and 'punct'.
+
+    Parameters
+    -----------
+    words: iterable of str
+        the keywords to find, as whole words
+
+    punctuation: str
+        the punctuation characters to find (default: parentheses, comma and semicolon)
+    """
+    words = sorted(words, key=len, reverse=True)
+    keywords = '|'.join(re.escape(word) for word in words)
+    # the characters a match can start with, so that the other ones are skipped at once
+    first = {word[0].lower() for word in words} | {word[0].upper() for word in words}
+    first = ''.join(re.escape(char) for char in sorted(first | set(punctuation) | set("-/'\"‘`[")))
+    return re.compile(rf"""
+        (?=[{first}])
+        (?:
+        (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+      | (?P<quoted>{_QUOTED})
+      | (?<![\w@#$])(?P<word>{keywords})(?![\w@#$])
+      | (?P<punct>[{re.escape(punctuation)}])
+        )
+    """, re.VERBOSE | re.DOTALL | re.IGNORECASE)
+
+def unquote(text):
+    """Remove the quotes around a quoted identifier"""
+    if len(text) >= 2 and text[0] in '"`[':
+        return text[1:-1]
+    return text
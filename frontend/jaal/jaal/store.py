@@ -0,0 +1,145 @@
+"""
+Columnar on-disk store of a graph, in Arrow IPC (or Parquet) files
+
+A graph store is a directory holding the edge table (`edges.arrow`) and the
+node table (`nodes.arrow`, optional). The Arrow files are read through a
+memory map, so opening a graph reads the columns straight from the page cache
+instead of parsing text, and the categorical columns stay dictionary encoded.
+The node weights and titles are computed once, when converting the csv files.
+
+Needs the pyarrow package (`pip install pyarrow`).
+
+    python -m jaal.store edge.csv node.csv graph_dir
+"""
+
+# imports
+import os
+import sys
+import pandas as pd
+from .ingest import UPLOAD_DTYPES, concat_chunks
+from .datasets.degree import add_node_weight
+from .datasets.title import add_node_title
+
+# the file formats of the store, by extension
+STORE_FORMATS = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+def _pyarrow():
+    """Import pyarrow, raising an Exception saying how to install it if missing"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("The graph store needs the pyarrow package, install it with `pip install pyarrow`.")
+    return pyarrow
+
+def _table_file(path, name):
+    """Return the file of the table `name` ('edges' or 'nodes') in the store, None if missing"""
+    for extension in STORE_FORMATS.values():
+        file = os.path.join(path, name + extension)
+        if os.path.exists(file):
+            return file
+    return None
+
+def write_table(df, file):
+    """Write a dataframe as an Arrow IPC file (or a Parquet file if file ends with .parquet)"""
+    pa = _pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if file.endswith(STORE_FORMATS['parquet']):
+        pa.parquet.write_table(table, file)
+    else:
+        with pa.OSFile(file, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+def read_table(file, columns=None):
+    """Read an Arrow IPC (memory mapped) or Parquet file into a dataframe
+
+    Parameters
+    -----------
+    file: str
+        the file of the table
+
+    columns: list (optional)
+        the columns to read (default: all)
+    """
+    pa = _pyarrow()
+    if file.endswith(STORE_FORMATS['parquet']):
+        table = pa.parquet.read_table(file, columns=columns, memory_map=True)
+    else:
+        with pa.memory_map(file, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+def save_graph(path, edge_df, node_df=None, format='arrow'):
+    """Save the edge and node dataframes as a graph store
+
+    Parameters
+    -----------
+    path: str
+        the directory of the store, created if missing
+
+    edge_df, node_df: pandas dataframe
+        the edges and (optional) nodes
+
+    format: str
+        'arrow' (memory mapped when loading) or 'parquet' (smaller files) (default: 'arrow')
+    """
+    if format not in STORE_FORMATS:
+        raise Exception(f"Unknown store format '{format}', expected one of {list(STORE_FORMATS)}.")
+    os.makedirs(path, exist_ok=True)
+    # remove the tables of another format
+    for name in ('edges', 'nodes'):
+        for extension in STORE_FORMATS.values():
+            if os.path.exists(os.path.join(path, name + extension)):
+                os.remove(os.path.join(path, name + extension))
+    write_table(edge_df, os.path.join(path, 'edges' + STORE_FORMATS[format]))
+    if node_df is not None:
+        write_table(node_df, os.path.join(path, 'nodes' + STORE_FORMATS[format]))
+
+def load_graph(path):
+    """Return the (edge_df, node_df) of a graph store, node_df being None without nodes"""
+    edge_file = _table_file(path, 'edges')
+    if edge_file is None:
+        raise Exception(f"No edge table found in '{path}'.")
+    node_file = _table_file(path, 'nodes')
+    return read_table(edge_file), read_table(node_file) if node_file is not None else None
+
+def csv_to_store(edge_csv, node_csv, path, format='arrow', title_template=None, chunksize=100000):
+    """Convert node and edge csv files to a graph store, computing the node weights and titles
+
+    Parameters
+    -----------
+    edge_csv, node_csv: str
+        the csv files, as read by the app (node_csv may be None)
+
+    path: str
+        the directory of the store
+
+    format: str
+        'arrow' or 'parquet' (default: 'arrow')
+
+    title_template: list of (prefix, column) (optional)
+        the lines of the node titles, see add_node_title
+
+    chunksize: int
+        number of rows read at a time (default: 100000)
+    """
+    def read_csv(file):
+        header = pd.read_csv(file, nrows=0).columns
+        dtype = {col: value for col, value in UPLOAD_DTYPES.items() if col in header}
+        return concat_chunks(list(pd.read_csv(file, dtype=dtype, chunksize=chunksize)))
+    edge_df = read_csv(edge_csv)
+    node_df = None
+    if node_csv is not None:
+        node_df = add_node_title(add_node_weight(read_csv(node_csv), edge_df), title_template)
+    save_graph(path, edge_df, node_df, format)
+    return path
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("usage: python -m jaal.store edge.csv [node.csv] graph_dir")
+        sys.exit(1)
+    csv_to_store(sys.argv[1], sys.argv[2] if len(sys.argv) == 4 else None, sys.argv[-1])